@@ -0,0 +1,59 @@
+# Compare the approximated coverage of edge buffers by buildings and green
+# areas (computed on a grid) with the exact coverage (computed by intersecting
+# the buffers with the polygons), in runtime and in accuracy.
+# Differences are given in percentage points of coverage per edge.
+#
+#   python benchmarks/coverage.py --extract area.osm --resolutions 1 2 5
+#
+# Without an extract a synthetic one is generated, of which --size is the
+# number of streets in each direction.
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from netapy.assessors import NetascoreAssessor
+from netapy.networks import NetascoreNetwork
+
+def derive(network, label, resolution):
+  assessor = NetascoreAssessor("walk", coverage_resolution = resolution)
+  # Grids and prepared layers are cached, and should not be reused across runs.
+  network._geometry_cache.clear()
+  start = time.perf_counter()
+  obj = getattr(assessor, f"derive_{label}")(network, write = False)
+  duration = time.perf_counter() - start
+  return np.array([obj["data"][e] for e in network.edges(keys = True)], dtype = float), duration
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Benchmark approximated against exact coverage")
+  parser.add_argument("--extract", help = "OSM XML extract (default: a synthetic one)")
+  parser.add_argument("--size", type = int, default = 60)
+  parser.add_argument("--resolutions", type = float, nargs = "+", default = [1, 2, 5])
+  args = parser.parse_args(argv)
+  with tempfile.TemporaryDirectory() as tmpdir:
+    filepath = args.extract
+    if filepath is None:
+      from tests.conftest import write_extract
+      filepath = write_extract(os.path.join(tmpdir, "extract.osm"), size = args.size)
+    network = NetascoreNetwork.from_file(filepath)
+    for layer in ["buildings", "greenness"]:
+      network._check_layer_presence(layer, fetch = True)
+  print(f"{network.number_of_edges()} edges, {len(network.buildings)} buildings, "
+        f"{len(network.greenness)} green areas")
+  print(f"{'layer':10s} {'resolution':>10s} {'time [s]':>9s} {'mean':>6s} {'p95':>6s} {'max':>6s}")
+  for label in ["buildings", "greenness"]:
+    exact, duration = derive(network, label, None)
+    print(f"{label:10s} {'exact':>10s} {duration:9.2f}")
+    for resolution in args.resolutions:
+      values, duration = derive(network, label, resolution)
+      diff = np.abs(values - exact)
+      print(f"{label:10s} {resolution:10g} {duration:9.2f} {diff.mean():6.2f} "
+            f"{np.percentile(diff, 95):6.2f} {diff.max():6.2f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,44 @@
+# Measure the time it takes to import netapy and its main modules.
+# Each module is imported in a fresh interpreter with -X importtime, and the
+# cumulative import time of the module is reported as the median over runs.
+# Exits with status 1 if importing netapy takes longer than --max-ms.
+#
+#   python benchmarks/import_time.py --runs 5 --max-ms 50
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = ["netapy", "netapy.profiles", "netapy.assessors", "netapy.networks", "netapy.cli",
+           "netapy.service"]
+
+def measure(module):
+  proc = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+    capture_output = True, text = True, check = True
+  )
+  # Lines look like "import time: self [us] | cumulative | imported package".
+  for line in proc.stderr.splitlines():
+    parts = [x.strip() for x in line.split("|")]
+    if len(parts) == 3 and parts[2] == module:
+      return int(parts[1]) / 1000
+  raise RuntimeError(f"No import time reported for '{module}'")
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Benchmark netapy import times")
+  parser.add_argument("--runs", type = int, default = 5)
+  parser.add_argument("--max-ms", type = float, default = None,
+                      help = "fail if importing netapy takes longer than this")
+  parser.add_argument("modules", nargs = "*", default = MODULES)
+  args = parser.parse_args(argv)
+  out = {}
+  for module in args.modules:
+    out[module] = statistics.median(measure(module) for _ in range(args.runs))
+    print(f"{module:20s} {out[module]:8.1f} ms")
+  if args.max_ms is not None and out.get("netapy", 0) > args.max_ms:
+    print(f"Importing netapy took longer than {args.max_ms} ms")
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
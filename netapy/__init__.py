@@ -1,5 +1,15 @@
 __version__ = "0.1.0"
 
-import netapy.networks
-import netapy.assessors
-import netapy.profiles
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first access, such that importing netapy itself
+# does not pull in heavy dependencies like geopandas and osmnx.
+_SUBMODULES = ["accessibility", "assessors", "budget", "cli", "defaults", "exceptions", "indicators", "networks", "profiles", "routing", "service", "stores", "utils"]
+
+def __getattr__(name):
+  if name in _SUBMODULES:
+    return importlib.import_module(f"{__name__}.{name}")
+  raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+  return sorted(list(globals()) + _SUBMODULES)
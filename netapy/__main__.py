@@ -0,0 +1,5 @@
+import sys
+
+from netapy.cli import main
+
+sys.exit(main())
@@ -0,0 +1,92 @@
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from netapy import utils
+
+np = utils.lazy_import("numpy")
+pd = utils.lazy_import("pandas")
+shapely = utils.lazy_import("shapely")
+
+# Graph and node coordinates shared with forked worker processes.
+_SHARED = None
+
+def reachability(graph, origins, max_cost, coords = None, chunk_size = 50, workers = 1):
+  # Multi-source reachability on a routing.CSRGraph within a cost budget.
+  # An edge is reachable from an origin if it can be traversed completely,
+  # i.e. if the cost to its source node plus its own cost is within the budget.
+  # Returns a DataFrame with per origin the number of reachable nodes, the
+  # length of reachable edges and, if node coordinates are given, the area of
+  # the convex hull of the reachable nodes. Also returns a Series with per edge
+  # the number of origins it is reachable from (its catchment).
+  # Origins are processed in chunks, such that memory scales with the chunk
+  # size instead of the number of origins.
+  global _SHARED
+  sources = graph._get_positions(origins)
+  chunks = [sources[i:(i + chunk_size)] for i in range(0, len(sources), chunk_size)]
+  # The matrix is built once before forking, such that workers share it.
+  graph.matrix
+  lengths = np.ones(len(graph.edges)) if graph.lengths is None else graph.lengths
+  shared = (graph, lengths[graph.edge_ids], coords, max_cost)
+  if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+    _SHARED = shared
+    try:
+      context = multiprocessing.get_context("fork")
+      with ProcessPoolExecutor(min(workers, len(chunks)), mp_context = context) as executor:
+        results = list(executor.map(_reach_chunk, chunks))
+    finally:
+      _SHARED = None
+  else:
+    results = [_reach_chunk(x, shared) for x in chunks]
+  columns = ["nodes", "length"] if coords is None else ["nodes", "length", "area"]
+  stats = {k:np.concatenate([r[0][k] for r in results]) for k in columns} if results else {}
+  out = pd.DataFrame(stats, index = pd.Index(origins, name = "origin"), columns = columns)
+  counts = np.zeros(len(graph.edges), dtype = int)
+  for _, catchment in results:
+    counts[graph.edge_ids] += catchment
+  index = pd.MultiIndex.from_tuples(graph.edges, names = ["u", "v", "key"])
+  return out, pd.Series(counts, index = index, name = "catchment")
+
+def _reach_chunk(sources, shared = None):
+  from scipy.sparse.csgraph import dijkstra
+  graph, lengths, coords, max_cost = _SHARED if shared is None else shared
+  dists = dijkstra(graph.matrix, directed = True, indices = sources, limit = max_cost)
+  # Reachable (origin, node) pairs are expanded to all outgoing edges of the node.
+  # Edges are referred to by their position in the compressed sparse row arrays.
+  rows, nodes = np.nonzero(np.isfinite(dists))
+  degrees = np.diff(graph.indptr)[nodes]
+  pairs = np.repeat(np.arange(len(nodes)), degrees)
+  offsets = np.arange(len(pairs)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+  positions = graph.indptr[nodes][pairs] + offsets
+  reachable = dists[rows[pairs], nodes[pairs]] + graph.costs[positions] <= max_cost
+  edge_rows = rows[pairs][reachable]
+  positions = positions[reachable]
+  n = len(sources)
+  stats = {
+    "nodes": np.bincount(rows, minlength = n),
+    "length": np.bincount(edge_rows, weights = lengths[positions], minlength = n)
+  }
+  if coords is not None:
+    stats["area"] = _hull_areas(coords[nodes], rows)
+  return stats, np.bincount(positions, minlength = len(graph.costs))
+
+def _hull_areas(points, groups):
+  # Areas of the convex hulls of groups of points, with groups sorted and numbered 0..n-1.
+  # Points strictly inside the octagon spanned by the extreme points of their
+  # group in eight directions can not be on the hull and are dropped before
+  # constructing geometries (Akl-Toussaint heuristic).
+  x, y = points[:, 0], points[:, 1]
+  starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+  vertices = []
+  # Directions are in counterclockwise order, such that the octagon is as well.
+  for values in [x, x + y, y, y - x, -x, -x - y, -y, x - y]:
+    is_max = values == np.maximum.reduceat(values, starts)[groups]
+    idx = np.flatnonzero(is_max)
+    first = idx[np.r_[True, groups[idx][1:] != groups[idx][:-1]]]
+    vertices.append(points[first])
+  inside = np.ones(len(points), dtype = bool)
+  for a, b in zip(vertices, vertices[1:] + vertices[:1]):
+    a, b = a[groups], b[groups]
+    inside &= (b[:, 0] - a[:, 0]) * (y - a[:, 1]) - (b[:, 1] - a[:, 1]) * (x - a[:, 0]) > 0
+  hulls = shapely.convex_hull(shapely.multipoints(points[~inside], indices = groups[~inside]))
+  return shapely.area(hulls)
@@ -1,17 +1,24 @@
-import networkx as nx
-import pandas as pd
 import copy
+import functools
+import glob
 import inspect
 import logging
+import os
 import random
 import warnings
 
 from abc import abstractmethod
 
-from netapy import defaults, utils
+from netapy import __version__, budget, defaults, indicators, utils
+from netapy.stores import AttributeStore
 from netapy.profiles import NetascoreProfile
 from netapy.exceptions import NetapyNetworkError
 
+np = utils.lazy_import("numpy")
+nx = utils.lazy_import("networkx")
+pd = utils.lazy_import("pandas")
+shapely = utils.lazy_import("shapely")
+
 logger = logging.getLogger(__name__)
 
 class Assessor():
@@ -26,13 +33,23 @@ class Assessor():
 
 class NetascoreAssessor(Assessor):
 
-  def __init__(self, profile, naming_config = None, fetch_layers = True):
+  def __init__(self, profile, naming_config = None, fetch_layers = True,
+               attribute_store = None, memory_budget = None,
+               coverage_resolution = None, layer_tolerance = None, indicators = None,
+               spill_dir = None):
     self.profile = profile
     if naming_config is None:
       self.naming_config = defaults.NETASCORE_NAMING_CONFIG
     else:
       self.naming_config = naming_config
     self.fetch_layers = fetch_layers
+    self.attribute_store = attribute_store
+    self.memory_budget = memory_budget
+    self.memory_plan = None
+    self.spill_dir = spill_dir
+    self.coverage_resolution = coverage_resolution
+    self.layer_tolerance = layer_tolerance
+    self.indicators = indicators
     self._subindex_cache = {}
     self._attribute_cache = {}
     self._use_attribute_cache = False
@@ -70,52 +87,370 @@ class NetascoreAssessor(Assessor):
   def fetch_layers(self, value):
     self._fetch_layers = value
 
+  @property
+  def attribute_store(self):
+    return self._attribute_store
+
+  @attribute_store.setter
+  def attribute_store(self, value):
+    if isinstance(value, str):
+      value = AttributeStore(value)
+    self._attribute_store = value
+
+  @property
+  def memory_budget(self):
+    return self._memory_budget
+
+  @memory_budget.setter
+  def memory_budget(self, value):
+    # The budget is given in megabytes.
+    if value is not None and value <= 0:
+      raise ValueError(f"Memory budget should be positive, got {value}")
+    self._memory_budget = value
+
+  @property
+  def spill_dir(self):
+    return self._spill_dir
+
+  @spill_dir.setter
+  def spill_dir(self, value):
+    # Directory to which columns are spilled when they do not fit the memory budget.
+    # Without it, these columns are discarded instead.
+    self._spill_dir = value
+
+  @property
+  def coverage_resolution(self):
+    return self._coverage_resolution
+
+  @coverage_resolution.setter
+  def coverage_resolution(self, value):
+    # With a resolution in meters, coverage of edge buffers by buildings and
+    # green areas is approximated on a grid instead of computed exactly.
+    if value is not None and value <= 0:
+      raise ValueError(f"Coverage resolution should be positive, got {value}")
+    self._coverage_resolution = value
+
+  @property
+  def layer_tolerance(self):
+    return self._layer_tolerance
+
+  @layer_tolerance.setter
+  def layer_tolerance(self, value):
+    # With a tolerance in meters, building and green area polygons are
+    # simplified before their coverage of edge buffers is computed.
+    if value is not None and value < 0:
+      raise ValueError(f"Layer tolerance should not be negative, got {value}")
+    self._layer_tolerance = value
+
+  @property
+  def indicators(self):
+    # Custom indicators of this assessor, together with all registered ones.
+    return {**indicators.get_registered(), **self._indicators}
+
+  @indicators.setter
+  def indicators(self, value):
+    value = {} if value is None else {x.label:x for x in value}
+    for label in value:
+      if hasattr(self, f"derive_{label}"):
+        raise ValueError(f"Indicator '{label}' conflicts with a built-in attribute")
+    self._indicators = value
+
   def run(self, network, **config):
     return self.generate_index(network, **config)
 
-  def clean(self, network, **config):
-    # TODO: Create workflow to remove all netascore columns from network.
-    raise NotImplementedError()
+  def clean(self, network, keep = None, **config):
+    # Columns that share their name with an OSM street key are always kept.
+    # With an empty attribute prefix a derived attribute like 'width' would
+    # otherwise not be distinguishable from the OSM tag it is derived from.
+    keep = set(defaults.NETASCORE_STREET_KEYS) | set([] if keep is None else keep)
+    names = self._find_colnames() - keep
+    # Compact networks store each column once, so they can be dropped in bulk.
+    store = getattr(network, "_edge_store", None)
+    if store is not None:
+      store.drop_columns(*names)
+      return
+    # Otherwise remove all columns in a single traversal over the edges.
+    for *_, data in network.edges(data = True):
+      for k in [k for k in data if k in names]:
+        del data[k]
+
+  def _find_colnames(self):
+    # Attributes are all those that can be derived by this assessor.
+    attributes = [x[7:] for x in dir(self) if x.startswith("derive_")]
+    attributes.extend(self.indicators)
+    names = set(self._find_index_colnames(robustness = True))
+    for direction in [None, "forward", "backward"]:
+      for x in attributes:
+        names.add(self._construct_attribute_colname(x, direction))
+    return names
+
+  def _find_index_colnames(self, robustness = False):
+    # Subindices are all those that are weighted in the profile.
+    # Parsed weights are used, since these are the ones generate_index writes.
+    labels = [None] + list(self.profile.parsed["weights"].keys())
+    if robustness:
+      labels.append("robustness")
+    names = []
+    for x in labels:
+      for direction in [None, "forward", "backward"]:
+        names.append(self._construct_index_colname(x, direction))
+    return names
 
   def generate_index(self, network, digits = 2, read = False, write = True,
                      read_subs = None, write_subs = None, read_attrs = None,
                      write_attrs = None, ignore_nodata = False,
-                     compute_robustness = False):
+                     compute_robustness = False, chunk_size = None):
     obj = self._init_metadata(kind = "index", directed = True)
     # Read values from the network if read = True and the index exists.
     if read:
       self._read_from_network(obj, network)
     # Otherwise derive the indices by taking a weighted average of subindices.
+    # Large networks are processed in chunks to stay within the memory budget.
     if not obj["data"]:
+      config = {
+        "digits": digits,
+        "read": read,
+        "write": write,
+        "read_subs": read_subs,
+        "write_subs": write_subs,
+        "read_attrs": read_attrs,
+        "write_attrs": write_attrs,
+        "ignore_nodata": ignore_nodata,
+        "compute_robustness": compute_robustness
+      }
+      if chunk_size is None and self.memory_budget is not None:
+        # Layers are fetched up front, such that their size is known when planning.
+        self._fetch_required_layers(network)
+      plan = self._plan_memory(network, chunk_size, **config)
+      if plan is not None and plan.strategy != "single":
+        return self._generate_index_chunked(network, plan, **config)
       config = {
         "read": read if read_subs is None else read_subs,
         "write": write if write_subs is None else write_subs,
         "read_attrs": read if read_attrs is None else read_attrs,
         "write_attrs": write if write_attrs is None else write_attrs
       }
-      self._subindex_cache = self.generate_subindices(network, **config)
-      edges = network.edges
-      indexer = lambda e, d: self._index_edge(e, d, digits, ignore_nodata, compute_robustness)
+      # Attributes stay cached, since overrides match rules against them.
+      self._subindex_cache = self.generate_subindices(network, clear_cache = False, **config)
+      edges = list(network.edges)
+      labels = list(self.profile.parsed["weights"].keys())
+      weights = np.array(list(self.profile.parsed["weights"].values()), dtype = float)
+      overrides = self.profile.parsed["overrides"]
+      if overrides:
+        # Overrides may adjust weights of indicators that are otherwise not weighted.
+        extra = [x for o in overrides for x in o["for"] if x not in labels]
+        extra = list(dict.fromkeys(extra))
+        if extra:
+          extra_config = {**config, "write": False}
+          subs = self.generate_subindices(network, labels = extra, clear_cache = False, **extra_config)
+          self._subindex_cache.update(subs)
+        all_labels = labels + extra
+        all_weights = np.concatenate([weights, np.zeros(len(extra))])
+        attr_config = {"read": config["read_attrs"], "write": config["write_attrs"]}
+      if compute_robustness:
+        idx_obj = self._init_metadata(kind = "index", directed = True)
+        rob_obj = self._init_metadata("robustness", kind = "index", directed = True)
       for direction in ["forward", "backward"]:
-        obj["data"][direction] = {e:indexer(e, direction) for e in edges}
+        matrix = self._get_subindex_matrix(edges, direction, labels)
+        index, robustness = self._aggregate_subindices(matrix, weights, digits, ignore_nodata)
+        if overrides:
+          W, fixed = self._apply_overrides(network, edges, direction, all_labels,
+                                           all_weights, **attr_config)
+          # Only edges with adjusted weights are aggregated again.
+          rows = np.flatnonzero((W != all_weights).any(axis = 1))
+          if rows.size:
+            sub = matrix[rows]
+            if extra:
+              # Indicators that are only weighted by overrides should not turn
+              # the index into NaN where they are not weighted.
+              added = self._get_subindex_matrix([edges[i] for i in rows], direction, extra)
+              added[np.isnan(added) & (W[rows, len(labels):] == 0)] = 0
+              sub = np.hstack([sub, added])
+            index[rows], robustness[rows] = self._aggregate_subindices(
+              sub, W[rows], digits, ignore_nodata, per_edge = True
+            )
+          if digits is not None:
+            fixed = np.round(fixed, digits)
+          index = np.where(np.isnan(fixed), index, fixed)
+        index = index.tolist()
+        robustness = robustness.tolist()
+        if compute_robustness:
+          idx_obj["data"][direction] = dict(zip(edges, index))
+          rob_obj["data"][direction] = dict(zip(edges, robustness))
+          obj["data"][direction] = dict(zip(edges, zip(index, robustness)))
+        else:
+          obj["data"][direction] = dict(zip(edges, index))
       self._subindex_cache.clear()
+      self._attribute_cache.clear()
       # Write derived indices to the network if write = True.
       if write:
         if compute_robustness:
-          idx_obj = copy.deepcopy(obj)
-          rob_obj = copy.deepcopy(obj)
-          for direction in ["forward", "backward"]:
-            idx_obj["data"][direction] = {k:v[0] for k, v in obj["data"][direction].items()}
-            rob_obj["data"][direction] = {k:v[1] for k, v in obj["data"][direction].items()}
-            rob_obj["name"][direction] = self._construct_index_colname("robustness", direction)
           self._write_to_network(idx_obj, network)
           self._write_to_network(rob_obj, network)
         else:
           self._write_to_network(obj, network)
     return obj
 
+  def _plan_memory(self, network, chunk_size = None, write = True, write_subs = None,
+                   write_attrs = None, **kwargs):
+    n = network.number_of_edges()
+    if chunk_size is not None:
+      if chunk_size >= n:
+        return None
+      reasons = ["Chunk size was set explicitly"]
+      return budget.MemoryPlan(None, None, {}, "chunked", chunk_size, -(-n // chunk_size),
+                               reasons = reasons)
+    if self.memory_budget is None:
+      return None
+    # Estimate the memory each stage needs on top of what is already in use.
+    # Values of subindices and attributes that are written to the network stay
+    # in memory until the end, unless they are spilled to disk.
+    labels = list(self.profile.parsed["weights"].keys())
+    values = n * budget.VALUE_BYTES
+    write_subs = write if write_subs is None else write_subs
+    write_attrs = write if write_attrs is None else write_attrs
+    estimates = {
+      "index": (4 * values, "fixed"),
+      "attributes": (2 * len(labels) * values, "spillable" if write_attrs else "chunked"),
+      "subindices": (2 * len(labels) * values, "spillable" if write_subs else "chunked")
+    }
+    # Derivations from layers need projected edge geometries and buffers.
+    # Projected copies of the layers are proportional to their feature count.
+    # Layers that are not present are not estimated, see _fetch_required_layers.
+    layers = self._get_required_layers()
+    if layers:
+      size = 3 * n * (budget.GEOMETRY_BYTES + 4 * budget.VERTEX_BYTES)
+      estimates["edge geometries"] = (size, "chunked")
+      size = 0
+      for name in layers:
+        layer = getattr(network, name, None)
+        if layer is None or network._is_raster_layer(name):
+          continue
+        vertices = shapely.get_num_coordinates(layer.geometry.values).sum()
+        size += 2 * (len(layer) * budget.GEOMETRY_BYTES + vertices * budget.VERTEX_BYTES)
+        # Approximated coverage needs a grid with its summed-area table.
+        if self.coverage_resolution is not None and name in ["buildings", "greenness"]:
+          area = network._get_extent(buffer = 30).area.sum()
+          size += 5 * area / self.coverage_resolution ** 2
+      estimates["layers"] = (size, "chunked")
+    plan = budget.plan(self.memory_budget * 1024 ** 2, n, estimates, self.spill_dir)
+    logger.info(repr(plan))
+    self.memory_plan = plan
+    return plan
+
+  def _get_required_layers(self):
+    labels = self.profile.parsed["weights"].keys()
+    layers = [x for label in labels for x in (self._get_inputs(label) or ([], []))[1]]
+    return list(dict.fromkeys(layers))
+
+  def _fetch_required_layers(self, network):
+    if not self.fetch_layers:
+      return
+    for name in self._get_required_layers():
+      if hasattr(network, f"fetch_{name}"):
+        network._check_layer_presence(name, fetch = True)
+
+  def _generate_index_chunked(self, network, plan, write = True, **config):
+    # Assess spatial tiles of edges as separate subnetworks, with layers clipped
+    # to the extent of the tile. Values written to a tile are copied to the
+    # network, except for spilled columns which are written to disk instead,
+    # or discarded if there is no spill directory.
+    obj = self._init_metadata(kind = "index", directed = True)
+    obj["data"] = {"forward": {}, "backward": {}}
+    names = self._find_colnames()
+    final = set()
+    for label in [None, "robustness"]:
+      for direction in ["forward", "backward"]:
+        final.add(self._construct_index_colname(label, direction))
+    spill = plan.strategy == "spill"
+    if spill and plan.spill_dir is not None:
+      # Chunks of earlier runs would otherwise be read together with these.
+      for filepath in glob.glob(os.path.join(plan.spill_dir, "chunk-*.pkl")):
+        os.remove(filepath)
+    discard = spill and plan.spill_dir is None
+    discarded = set()
+    tiles = network._get_edge_tiles(plan.chunk_size)
+    for i, edges in enumerate(tiles):
+      tile = network._get_subnetwork(edges)
+      tile._clip_layers()
+      tile_obj = self.generate_index(tile, write = write, chunk_size = len(edges), **config)
+      for direction in ["forward", "backward"]:
+        obj["data"][direction].update(tile_obj["data"][direction])
+      keep = final if spill else names
+      for u, v, k, data in tile.edges(keys = True, data = True):
+        target = network._succ[u][v][k]
+        for name in keep & data.keys():
+          target[name] = data[name]
+        if discard:
+          discarded.update((names - final) & data.keys())
+      if spill and plan.spill_dir is not None:
+        spilled = tile._get_edge_attributes(*sorted(names - final)).dropna(axis = 1, how = "all")
+        spilled.to_pickle(os.path.join(plan.spill_dir, f"chunk-{i:05d}.pkl"))
+      logger.info(f"Assessed chunk {i + 1} of {len(tiles)}")
+    if discarded:
+      warnings.warn(
+        f"Columns {sorted(discarded)} did not fit the memory budget and were not written. "
+        "Set a spill_dir on the assessor to write them to disk instead."
+      )
+    return obj
+
+  def sweep_weights(self, network, weights, digits = 2, summarize = False,
+                    chunk_size = 100, read = False, write = False, read_attrs = None,
+                    write_attrs = None, ignore_nodata = False):
+    # Weights can be given as a list of dicts or as a dataframe.
+    # Each dict or row maps indicator labels to weights of one weight vector.
+    # Indicators missing from a weight vector get a weight of zero.
+    if not isinstance(weights, pd.DataFrame):
+      weights = pd.DataFrame(list(weights))
+    weights = weights.fillna(0)
+    labels = list(weights.columns)
+    config = {
+      "read": read,
+      "write": write,
+      "read_attrs": read if read_attrs is None else read_attrs,
+      "write_attrs": write if write_attrs is None else write_attrs
+    }
+    # Subindices are derived only once and shared by all weight vectors.
+    self._subindex_cache = self.generate_subindices(network, labels = labels, **config)
+    edges = pd.MultiIndex.from_tuples(list(network.edges))
+    out = {}
+    for direction in ["forward", "backward"]:
+      matrix = self._get_subindex_matrix(edges, direction, labels)
+      # Weight vectors are processed in chunks to bound memory usage.
+      # When summarizing, only the statistics of each chunk are kept.
+      chunks = []
+      for start in range(0, len(weights), chunk_size):
+        chunk = weights.iloc[start:(start + chunk_size)]
+        W = chunk.to_numpy(dtype = float).T
+        index, _ = self._aggregate_subindices(matrix, W, digits, ignore_nodata)
+        if summarize:
+          chunks.append(self._summarize_indices(index, chunk.index))
+        else:
+          chunks.append(pd.DataFrame(index, index = edges, columns = chunk.index))
+      out[direction] = pd.concat(chunks, axis = 0 if summarize else 1)
+    self._subindex_cache.clear()
+    return out
+
+  @staticmethod
+  def _summarize_indices(index, names):
+    # Each column of the index array holds the index values of one weight vector.
+    with warnings.catch_warnings():
+      warnings.simplefilter("ignore", category = RuntimeWarning)
+      stats = {
+        "count": np.sum(~np.isnan(index), axis = 0),
+        "mean": np.nanmean(index, axis = 0),
+        "std": np.nanstd(index, axis = 0),
+        "min": np.nanmin(index, axis = 0),
+        "25%": np.nanpercentile(index, 25, axis = 0),
+        "50%": np.nanpercentile(index, 50, axis = 0),
+        "75%": np.nanpercentile(index, 75, axis = 0),
+        "max": np.nanmax(index, axis = 0)
+      }
+    return pd.DataFrame(stats, index = names)
+
   def generate_subindices(self, network, read = False, write = True,
-                          read_attrs = None, write_attrs = None):
+                          read_attrs = None, write_attrs = None, labels = None,
+                          clear_cache = True):
     out = {}
     config = {
       "read": read,
@@ -124,9 +459,12 @@ class NetascoreAssessor(Assessor):
       "write_attrs": write_attrs,
       "clear_cache": False
     }
-    for i in self.profile.parsed["weights"]:
+    if labels is None:
+      labels = self.profile.parsed["weights"].keys()
+    for i in labels:
       out[i] = self.generate_subindex(i, network, **config)
-    self._attribute_cache.clear()
+    if clear_cache:
+      self._attribute_cache.clear()
     return out
 
   def generate_subindex(self, label, network, read = False, write = True,
@@ -174,14 +512,14 @@ class NetascoreAssessor(Assessor):
           other_attr = self.generate_attribute(x, network, **config)
           self._attribute_cache[x] = other_attr
       # Generate the subindex values for each edge.
-      indexer = lambda e, d: self._subindex_edge(e, label, mapping, d)
       if directed:
         for direction in ["forward", "backward"]:
-          idxs = {e:indexer(e, direction) for e in attr["data"][direction]}
-          obj["data"][direction] = idxs
+          edges = list(attr["data"][direction])
+          idxs = self._map_subindex(label, mapping, edges, direction)
+          obj["data"][direction] = dict(zip(edges, idxs))
       else:
-        idxs = {e:indexer(e, None) for e in attr["data"]}
-        obj["data"] = idxs
+        edges = list(attr["data"])
+        obj["data"] = dict(zip(edges, self._map_subindex(label, mapping, edges)))
       # Reset attribute cache.
       if clear_cache:
         self._attribute_cache.clear()
@@ -192,7 +530,113 @@ class NetascoreAssessor(Assessor):
     return obj
 
   def generate_attribute(self, label, network, read = False, write = True, **kwargs):
-    return getattr(self, f"derive_{label}")(network, read, write, **kwargs)
+    if not read and self._is_storable(label, network):
+      return self._generate_stored_attribute(label, network, write, **kwargs)
+    return self._get_derivation(label)(network, read, write, **kwargs)
+
+  def _get_derivation(self, label):
+    # Built-in attributes have a derive method, custom indicators a kernel.
+    try:
+      return getattr(self, f"derive_{label}")
+    except AttributeError:
+      pass
+    try:
+      return functools.partial(self._derive_indicator, self.indicators[label])
+    except KeyError:
+      raise ValueError(f"Unknown attribute: '{label}'")
+
+  def _get_inputs(self, label):
+    # Edge attributes (including "geometry") that an attribute depends on,
+    # and the layers it uses, or None if these are not known. Inputs of custom
+    # indicators that are attributes themselves are replaced by their inputs.
+    if hasattr(self, f"derive_{label}"):
+      try:
+        inputs = defaults.NETASCORE_ATTRIBUTE_INPUTS[label]
+      except KeyError:
+        return None
+      return inputs, [label] if "geometry" in inputs else []
+    try:
+      indicator = self.indicators[label]
+    except KeyError:
+      return None
+    inputs = []
+    layers = list(indicator.layers)
+    for x in indicator.inputs:
+      if self._is_derivable(x):
+        other = self._get_inputs(x)
+        if other is None:
+          return None
+        inputs.extend(other[0])
+        layers.extend(other[1])
+      else:
+        inputs.append(x)
+    return list(dict.fromkeys(inputs)), list(dict.fromkeys(layers))
+
+  def _is_derivable(self, label):
+    return hasattr(self, f"derive_{label}") or label in self.indicators
+
+  def _is_storable(self, label, network):
+    if self.attribute_store is None:
+      return False
+    inputs = self._get_inputs(label)
+    if inputs is None:
+      return False
+    # Attributes derived from a layer can only be stored if the version of
+    # that layer is known. Otherwise changes to the layer would go unnoticed.
+    versions = self.attribute_store.layer_versions
+    return all(versions.get(x) is not None for x in inputs[1])
+
+  def _generate_stored_attribute(self, label, network, write = True, **kwargs):
+    store = self.attribute_store
+    keys = self._get_store_keys(label, network)
+    hits = store.get(label, keys.values())
+    # Only edges without an entry in the store are derived, in a separate subnetwork.
+    missing = [e for e, k in keys.items() if k not in hits]
+    if missing:
+      if len(missing) < len(keys):
+        subnetwork = network._get_subnetwork(missing)
+      else:
+        subnetwork = network
+      derived = self._get_derivation(label)(subnetwork, False, False, **kwargs)
+      directed = derived["directed"]
+      if directed:
+        extractor = lambda e: [derived["data"][d].get(e) for d in ["forward", "backward"]]
+      else:
+        extractor = lambda e: derived["data"].get(e)
+      entries = {keys[e]:{"directed": directed, "value": extractor(e)} for e in missing}
+      store.set(label, entries)
+      hits.update(entries)
+    else:
+      directed = next(iter(hits.values()))["directed"] if hits else False
+    obj = self._init_metadata(label, kind = "attribute", directed = directed)
+    if directed:
+      for i, direction in enumerate(["forward", "backward"]):
+        obj["data"][direction] = {e:hits[k]["value"][i] for e, k in keys.items()}
+    else:
+      obj["data"] = {e:hits[k]["value"] for e, k in keys.items()}
+    # Write derived attributes to the network if write = True.
+    if write:
+      self._write_to_network(obj, network)
+    return obj
+
+  def _get_store_keys(self, label, network):
+    # The fingerprint covers the input attributes, the version of the rules
+    # (netapy version and source code of the derivation) and the layer version.
+    inputs, layers = self._get_inputs(label)
+    tags = [x for x in inputs if x != "geometry"]
+    data = network._get_edge_attributes("osmid", *tags)
+    if "geometry" in inputs:
+      data["geometry"] = network._get_edge_geometries().to_wkb().to_numpy()
+    rules = self._get_rules(label)
+    if hasattr(self, f"derive_{label}"):
+      version = self.attribute_store.layer_versions.get(label)
+    else:
+      version = tuple(self.attribute_store.layer_versions.get(x) for x in layers)
+    keys = {}
+    for e, row in zip(data.index, data.itertuples(index = False)):
+      osmid = repr(row[0])
+      keys[e] = (osmid, AttributeStore.fingerprint(__version__, rules, version, *row))
+    return keys
 
   def derive_access_car(self, network, read = False, write = True, **kwargs):
     label = "access_car"
@@ -346,7 +790,7 @@ class NetascoreAssessor(Assessor):
         # Fallback option: "no"
         return "no"
       for direction in ["forward", "backward"]:
-        vals = {x[0]:set_value(x[1], direction) for x in data.iterrows()}
+        vals = dict(zip(data.index, self._apply_unique(data, set_value, direction)))
         obj["data"][direction] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -406,7 +850,7 @@ class NetascoreAssessor(Assessor):
         # Fallback option: "no"
         return "no"
       for direction in ["forward", "backward"]:
-        vals = {x[0]:set_value(x[1], direction) for x in data.iterrows()}
+        vals = dict(zip(data.index, self._apply_unique(data, set_value, direction)))
         obj["data"][direction] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -449,7 +893,7 @@ class NetascoreAssessor(Assessor):
           if k(g):
             return v
         return float("nan")
-      vals = {x[0]:set_value(x[1]) for x in data.iterrows()}
+      vals = dict(zip(data.index, self._apply_unique(data, set_value)))
       obj["data"]["forward"] = vals
       obj["data"]["backward"] = {k:v * -1 for k, v in vals.items()}
       # Write derived attributes to the network if write = True.
@@ -506,11 +950,9 @@ class NetascoreAssessor(Assessor):
       # Fetch input data.
       labs = ["highway", "access", "bicycle", "foot", "motor_vehicle",
               "maxspeed", "tracktype", "surface"]
-      data = network._get_edge_attributes(network, *labs)
-      # Convert maxspeed values to numeric.
-      # TODO: How to handle different units of maxspeed?
-      nums = [utils.split_string(x, split_nodata = True)[1] for x in data["maxspeed"]]
-      data["maxspeed"] = nums
+      data = network._get_undirected_attributes(*labs)
+      # Convert maxspeed values to numeric values in km/h.
+      data["maxspeed"] = utils.parse_speed(data["maxspeed"]).to_numpy()
       # Derive attribute values for each street segment from the input data.
       def set_value(x):
         # First option: "primary"
@@ -565,7 +1007,7 @@ class NetascoreAssessor(Assessor):
         if (C1 and C2 and C3) or C4 or (C5 and C6 and C7):
           return "path"
         return None
-      vals = {x[0]:set_value(x[1]) for x in data.iterrows()}
+      vals = network._spread_undirected(self._apply_unique(data, set_value))
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -588,7 +1030,7 @@ class NetascoreAssessor(Assessor):
         warnings.warn(f"Derivation of attribute '{label}' is not yet implemented")
         return None
       for direction in ["forward", "backward"]:
-        vals = {x[0]:set_value(x[1], direction) for x in data.iterrows()}
+        vals = dict(zip(data.index, self._apply_unique(data, set_value, direction)))
         obj["data"][direction] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -607,17 +1049,12 @@ class NetascoreAssessor(Assessor):
       labs = ["lanes", "lanes:forward", "lanes:backward"]
       data = network._get_edge_attributes(network, *labs)
       # Derive attribute values for each street segment from the input data.
-      def set_value(x, direction):
-        directed_lanes = x[f"lanes:{direction}"]
-        undirected_lanes = x["lanes"]
-        if pd.notnull(directed_lanes):
-          return float(directed_lanes)
-        if pd.notnull(undirected_lanes):
-          return float(undirected_lanes)
-        return float("nan")
+      # Directed lane counts take precedence over undirected lane counts.
+      undirected_lanes = utils.parse_count(data["lanes"]).to_numpy()
       for direction in ["forward", "backward"]:
-        vals = {x[0]:set_value(x[1], direction) for x in data.iterrows()}
-        obj["data"][direction] = vals
+        directed_lanes = utils.parse_count(data[f"lanes:{direction}"]).to_numpy()
+        vals = np.where(np.isnan(directed_lanes), undirected_lanes, directed_lanes)
+        obj["data"][direction] = dict(zip(data.index, vals.tolist()))
       # Write derived attributes to the network if write = True.
       if write:
         self._write_to_network(obj, network)
@@ -633,13 +1070,11 @@ class NetascoreAssessor(Assessor):
     if not obj["data"]:
       # Fetch input data.
       labs = ["width"]
-      data = network._get_edge_attributes(network, *labs)
+      data = network._get_undirected_attributes(*labs)
       # Derive attribute values for each street segment from the input data.
-      def set_value(x):
-        # TODO: How to handle different units of width?
-        return utils.split_string(x["width"], split_nodata = True)[1]
-      vals = {x[0]:set_value(x[1]) for x in data.iterrows()}
-      obj["data"] = vals
+      # Widths are converted to meters.
+      vals = utils.parse_length(data["width"]).to_numpy()
+      obj["data"] = network._spread_undirected(vals.tolist())
       # Write derived attributes to the network if write = True.
       if write:
         self._write_to_network(obj, network)
@@ -655,7 +1090,7 @@ class NetascoreAssessor(Assessor):
     if not obj["data"]:
       # Fetch input data.
       labs = ["surface"]
-      data = network._get_edge_attributes(network, *labs)
+      data = network._get_undirected_attributes(*labs)
       # Derive attribute values for each street segment from the input data.
       def set_value(x):
         # First option: "asphalt"
@@ -677,7 +1112,7 @@ class NetascoreAssessor(Assessor):
           return "cobble"
         # Fallback option: None
         return None
-      vals = {x[0]:set_value(x[1]) for x in data.iterrows()}
+      vals = network._spread_undirected(self._apply_unique(data, set_value))
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -700,7 +1135,7 @@ class NetascoreAssessor(Assessor):
         warnings.warn(f"Derivation of attribute '{label}' is not yet implemented")
         return None
       for direction in ["forward", "backward"]:
-        vals = {x[0]:set_value(x[1], direction) for x in data.iterrows()}
+        vals = dict(zip(data.index, self._apply_unique(data, set_value, direction)))
         obj["data"][direction] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -716,12 +1151,12 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("crossings", fetch = self.fetch_layers)
-      edges = network._get_edge_geometries(projected = True)
+      edges = network._get_undirected_geometries(projected = True)
       layer = network._get_layer_geometries("crossings", projected = True)
       def set_value(x):
         buffer = x.buffer(distance = 10, cap_style = 2)
         return buffer.intersects(layer).sum()
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      vals = network._spread_undirected([set_value(x) for x in edges])
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -737,14 +1172,11 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("buildings", fetch = self.fetch_layers)
-      edges = network._get_edge_geometries(projected = True)
-      layer = network._get_layer_geometries("buildings", projected = True)
-      def set_value(x):
-        buffer = x.buffer(distance = 20, cap_style = 2)
-        intersection = buffer.intersection(layer)
-        proportion = round(intersection.area.sum() / buffer.area * 100, 1)
-        return min(proportion, 100)
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      if self.coverage_resolution is not None:
+        shares = network._compute_coverage_around_edges("buildings", 20, self.coverage_resolution)
+      else:
+        shares = network._intersect_coverage_around_edges("buildings", 20, self.layer_tolerance)
+      vals = {k:round(min(v, 100), 1) for k, v in shares.items()}
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -760,12 +1192,12 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("facilities", fetch = self.fetch_layers)
-      edges = network._get_edge_geometries(projected = True)
+      edges = network._get_undirected_geometries(projected = True)
       layer = network._get_layer_geometries("facilities", projected = True)
       def set_value(x):
         buffer = x.buffer(distance = 10, cap_style = 2)
         return buffer.intersects(layer).sum()
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      vals = network._spread_undirected([set_value(x) for x in edges])
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -781,14 +1213,16 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("greenness", fetch = self.fetch_layers)
-      edges = network._get_edge_geometries(projected = True)
-      layer = network._get_layer_geometries("greenness", projected = True)
-      def set_value(x):
-        buffer = x.buffer(distance = 30, cap_style = 2)
-        intersection = buffer.intersection(layer)
-        proportion = round(intersection.area.sum() / buffer.area * 100, 1)
-        return min(proportion, 100)
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      # Raster layers are expected to contain the green cover in percentages.
+      if network._is_raster_layer("greenness"):
+        means = network._sample_raster_around_edges("greenness", distance = 30)
+        vals = {k:round(min(v, 100), 1) for k, v in means.items()}
+      elif self.coverage_resolution is not None:
+        shares = network._compute_coverage_around_edges("greenness", 30, self.coverage_resolution)
+        vals = {k:round(min(v, 100), 1) for k, v in shares.items()}
+      else:
+        shares = network._intersect_coverage_around_edges("greenness", 30, self.layer_tolerance)
+        vals = {k:round(min(v, 100), 1) for k, v in shares.items()}
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -804,12 +1238,12 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("water", fetch = self.fetch_layers)
-      edges = network._get_edge_geometries(projected = True)
+      edges = network._get_undirected_geometries(projected = True)
       layer = network._get_layer_geometries("water", projected = True)
       def set_value(x):
         buffer = x.buffer(distance = 30, cap_style = 2)
         return buffer.intersects(layer).sum() > 0
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      vals = network._spread_undirected([set_value(x) for x in edges])
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
@@ -825,22 +1259,128 @@ class NetascoreAssessor(Assessor):
     # Otherwise derive the attribute values from the network data.
     if not obj["data"]:
       network._check_layer_presence("noise", fetch = False)
-      edges = network._get_edge_geometries(projected = True)
-      polys = network._get_layer_geometries("noise", projected = True)
-      noise = network._get_layer_attributes("noise", "noise")
-      def set_value(x):
-        lengths = x.intersection(polys).length
-        intersects = lengths > 0
-        weights = lengths[intersects]
-        values = noise[intersects] * weights
-        return round(sum(values) / sum(weights), 0)
-      vals = {x[0]:set_value(x[1]) for x in edges.items()}
+      # Raster layers are expected to contain the noise level in decibels.
+      if network._is_raster_layer("noise"):
+        means = network._sample_raster_along_edges("noise")
+        vals = {k:round(v, 0) for k, v in means.items()}
+      else:
+        # Vector layers are expected to contain polygons with the noise level in
+        # decibels, of which the mean is weighted by the length of the edge in them.
+        # Only pairs of edges and polygons whose bounding boxes intersect are
+        # intersected, all at once.
+        edges = network._get_undirected_geometries(projected = True).values
+        polys = network._get_layer_geometries("noise", projected = True)
+        noise = network._get_layer_attributes("noise", "noise")["noise"].to_numpy(dtype = float)
+        i, j = polys.sindex.query(edges, predicate = "intersects")
+        lengths = shapely.length(shapely.intersection(edges[i], polys.values[j]))
+        valid = ~np.isnan(noise[j])
+        weights = np.bincount(i[valid], weights = lengths[valid], minlength = len(edges))
+        sums = np.bincount(i[valid], weights = (noise[j] * lengths)[valid], minlength = len(edges))
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+          means = np.round(np.where(weights > 0, sums / weights, np.nan), 0)
+        vals = network._spread_undirected(means.tolist())
       obj["data"] = vals
       # Write derived attributes to the network if write = True.
       if write:
         self._write_to_network(obj, network)
     return obj
 
+  def _derive_indicator(self, indicator, network, read = False, write = True, **kwargs):
+    label = indicator.label
+    obj = self._init_metadata(label, kind = "attribute", directed = indicator.directed)
+    # Read values from the network if read = True and the attribute exists.
+    if read:
+      self._read_from_network(obj, network)
+    # Otherwise derive the attribute values by running the kernel.
+    if not obj["data"]:
+      layers = {}
+      for name in indicator.layers:
+        network._check_layer_presence(name, fetch = self.fetch_layers)
+        layers[name] = network._get_projected_layer(name)
+      # Inputs that are attributes themselves are derived first.
+      derived = {}
+      for x in indicator.inputs:
+        if not self._is_derivable(x):
+          continue
+        if self._use_attribute_cache:
+          try:
+            derived[x] = self._attribute_cache[x]
+          except KeyError:
+            derived[x] = self.generate_attribute(x, network, read = read, write = write)
+            self._attribute_cache[x] = derived[x]
+        else:
+          derived[x] = self.generate_attribute(x, network, read = read, write = write)
+      if indicator.directed:
+        for direction in ["forward", "backward"]:
+          data = self._get_indicator_input(indicator, network, derived, direction)
+          values = self._run_kernel(indicator, data, layers, direction = direction)
+          obj["data"][direction] = dict(zip(data.index, values))
+      else:
+        # Undirected indicators are derived once per pair of reverse twins.
+        for x, attr in derived.items():
+          if attr["directed"]:
+            raise ValueError(f"Undirected indicator '{label}' can not use directed attribute '{x}'")
+        data = self._get_indicator_input(indicator, network, derived)
+        obj["data"] = network._spread_undirected(self._run_kernel(indicator, data, layers))
+      # Write derived attributes to the network if write = True.
+      if write:
+        self._write_to_network(obj, network)
+    return obj
+
+  @staticmethod
+  def _get_indicator_input(indicator, network, derived, direction = None):
+    # Dataframe with one column per input of the indicator, and one row per edge.
+    # Without a direction there is only one row per pair of reverse twins.
+    # With geometry as input, it is a GeoDataFrame in the projected CRS.
+    if direction is None:
+      _, positions = network._get_twin_index()
+      geoms = network._get_undirected_geometries(projected = True)
+    else:
+      positions = None
+      geoms = network._get_edge_geometries(projected = True)
+    tags = [x for x in indicator.inputs if x != "geometry" and x not in derived]
+    data = network._get_edge_attributes(*tags, positions = positions)
+    data.index = geoms.index
+    for x, attr in derived.items():
+      values = attr["data"][direction] if attr["directed"] else attr["data"]
+      data[x] = [values.get(e) for e in data.index]
+    if "geometry" in indicator.inputs:
+      data = geoms.to_frame(name = "geometry").join(data)
+    return data[indicator.inputs]
+
+  @staticmethod
+  def _run_kernel(indicator, data, layers, **kwargs):
+    values = np.asarray(indicator.kernel(data, **layers, **kwargs))
+    if values.shape != (len(data), ):
+      raise ValueError(
+        f"Kernel of indicator '{indicator.label}' returned {values.size} values for {len(data)} edges"
+      )
+    return values.tolist()
+
+  def _get_rules(self, label):
+    # Rules of an attribute are the source code of its derivation, together
+    # with the settings it depends on. Rules of a custom indicator include
+    # those of all attributes it uses, built-in or custom.
+    if hasattr(self, f"derive_{label}"):
+      derive = getattr(self, f"derive_{label}")
+      try:
+        rules = inspect.getsource(derive)
+      except (OSError, TypeError):
+        rules = derive.__code__.co_code
+      # Approximated coverage values should not be mixed up with exact ones.
+      if label in ["buildings", "greenness"]:
+        if self.coverage_resolution is not None:
+          rules = f"{rules}\ncoverage_resolution = {self.coverage_resolution}"
+        elif self.layer_tolerance is not None:
+          rules = f"{rules}\nlayer_tolerance = {self.layer_tolerance}"
+      return rules
+    indicator = self.indicators[label]
+    rules = [indicator.rules]
+    for x in indicator.inputs:
+      if self._is_derivable(x):
+        rules.append(self._get_rules(x))
+    return rules
+
   def _init_metadata(self, label = None, kind = "attribute", directed = False):
     # If directionality is not defined:
     # --> Create column names for both undirected and directed forms.
@@ -943,50 +1483,166 @@ class NetascoreAssessor(Assessor):
       value = data[edge_idx]
     except KeyError:
       value = float("nan")
-    if value is None:
+    # Missing values like None or pd.NA are all matched as NaN, since rules
+    # can not compare pd.NA to their values.
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
       value = float("nan")
     return value
 
-  def _index_edge(self, idx, direction, digits = 2, ignore_nodata = False,
-                  compute_robustness = False):
-    indicators = self.profile.parsed["weights"]
-    extractor = lambda obj: self._extract_value(obj, idx, direction)
-    if ignore_nodata:
-      values = []
-      weights = []
-      for i, x in indicators.items():
-        subindex = extractor(self._subindex_cache[i])
-        if pd.notnull(subindex):
-          values.append(subindex * x)
-          weights.append(x)
+  def _get_subindex_matrix(self, edges, direction, labels):
+    # Rows are edges and columns are indicators, in the order of the labels.
+    # Missing subindex values are stored as NaN.
+    columns = []
+    for i in labels:
+      obj = self._subindex_cache[i]
+      data = obj["data"][direction] if obj["directed"] else obj["data"]
+      columns.append([data.get(e) for e in edges])
+    matrix = np.array(columns, dtype = float).reshape(len(columns), len(edges))
+    return matrix.T
+
+  @staticmethod
+  def _aggregate_subindices(matrix, weights, digits = 2, ignore_nodata = False,
+                            per_edge = False):
+    # Weights are either a vector, or a matrix with one weight vector per column.
+    # In the latter case the index is computed for each weight vector at once.
+    # With per_edge = True weights are a matrix with one weight vector per edge.
+    available = ~np.isnan(matrix)
+    if per_edge:
+      total = weights.sum(axis = 1)
+      if ignore_nodata:
+        numerator = (np.where(available, matrix, 0) * weights).sum(axis = 1)
+        denominator = (available * weights).sum(axis = 1)
+      else:
+        # Subindices without data make the weighted average NaN, unless their
+        # weight is zero, since NaN * 0 would otherwise still be NaN.
+        numerator = (np.where(available, matrix, 0) * weights).sum(axis = 1)
+        numerator[(~available & (weights != 0)).any(axis = 1)] = np.nan
+        denominator = total
+    elif ignore_nodata:
+      # Subindices without data do not count towards the weighted average.
+      total = weights.sum(axis = 0)
+      numerator = np.where(available, matrix, 0) @ weights
+      denominator = available @ weights
     else:
-      values = [extractor(self._subindex_cache[i]) * x for i, x in indicators.items()]
-      weights = indicators.values()
+      total = weights.sum(axis = 0)
+      # Subindices without data make the weighted average NaN, unless their
+      # weight is zero. Otherwise NaN * 0 would make the index of each weight
+      # vector depend on the indicators weighted by the other vectors.
+      numerator = np.where(available, matrix, 0) @ weights
+      missing = (~available).astype(float) @ (weights != 0).astype(float)
+      numerator = np.where(missing > 0, np.nan, numerator)
+      denominator = np.broadcast_to(total, numerator.shape)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+      index = np.where(denominator != 0, numerator / denominator, np.nan)
+      robustness = np.where(total != 0, denominator / total, np.nan)
+    if digits is not None:
+      index = np.round(index, digits)
+    return index, robustness
+
+  def _map_subindex(self, label, mapping, edges, direction = None):
+    # Index values of the given edges. Rules are matched once per distinct
+    # attribute value and the result is broadcasted to all edges with that
+    # value. Nested mappings are matched against the values of their own
+    # attribute, only for the edges that reach them.
+    attr = self._attribute_cache[label]
+    values = [self._extract_value(attr, e, direction) for e in edges]
+    out = [None] * len(edges)
+    for value, positions in self._group_values(values):
+      assignment = self._match_rule(value, mapping)
+      if isinstance(assignment, dict):
+        # TODO: What if subindex is directed but attribute not (or vice versa)?
+        nested = self._map_subindex(assignment["indicator"], assignment,
+                                    [edges[i] for i in positions], direction)
+        for i, x in zip(positions, nested):
+          out[i] = x
+      else:
+        for i in positions:
+          out[i] = assignment
+    return out
+
+  @staticmethod
+  def _group_values(values):
+    # Distinct values with the positions at which they occur.
+    # Values are grouped by type as well, since e.g. True == 1 == 1.0, and all
+    # missing values of the same type (like NaN, or pd.NA) form one group.
+    # Unhashable values are not grouped.
+    if not len(values):
+      return []
+    column = np.empty(len(values), dtype = object)
+    column[:] = values
     try:
-      indexvalue = round(sum(values) / sum(weights), digits)
-    except ZeroDivisionError:
-      indexvalue = float("nan")
-    if compute_robustness:
-      try:
-        robustness = sum(weights) / sum(indicators.values())
-      except ZeroDivisionError:
-        robustness = float("nan")
-      return indexvalue, robustness
-    else:
-      return indexvalue
+      codes, _ = pd.factorize(column, use_na_sentinel = False)
+    except TypeError:
+      return [(x, [i]) for i, x in enumerate(values)]
+    types, _ = pd.factorize(np.array([type(x).__name__ for x in values], dtype = object))
+    _, first, inverse = np.unique(codes * (types.max() + 1) + types, return_index = True,
+                                  return_inverse = True)
+    order = np.argsort(inverse, kind = "stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(first) + 1))
+    return [(values[i], order[bounds[j]:bounds[j + 1]]) for j, i in enumerate(first)]
+
+  def _apply_overrides(self, network, edges, direction, labels, weights, **config):
+    # Overrides adjust the weights or the index values of edges whose attribute
+    # values match their rules. Returns a weight matrix with one row per edge,
+    # and the fixed index values of edges (NaN where no index override applies).
+    # Later overrides take precedence over earlier ones.
+    W = np.tile(weights, (len(edges), 1))
+    fixed = np.full(len(edges), np.nan)
+    memo = {}
+    for override in self.profile.parsed["overrides"]:
+      values = self._match_override(override["mapping"], network, edges, direction,
+                                    memo, **config)
+      mask = ~np.isnan(values)
+      if override["type"] == "weight":
+        for label in override["for"]:
+          W[mask, labels.index(label)] = values[mask]
+      else:
+        fixed[mask] = values[mask]
+    return W, fixed
+
+  def _match_override(self, mapping, network, edges, direction, memo, **config):
+    # Values assigned to each edge by the rules of an override mapping, with NaN
+    # where no rule applies. Rules are matched once per distinct attribute value
+    # and the result is broadcasted to all edges with that value.
+    key = (id(mapping), direction)
+    if key in memo:
+      return memo[key]
+    label = mapping["indicator"]
+    try:
+      attr = self._attribute_cache[label]
+    except KeyError:
+      attr = self.generate_attribute(label, network, **config)
+      self._attribute_cache[label] = attr
+    data = attr["data"][direction] if attr["directed"] else attr["data"]
+    out = np.full(len(edges), np.nan)
+    for value, matches in self._group_values([data.get(e) for e in edges]):
+      assignment = self._match_rule(value, mapping)
+      if isinstance(assignment, dict):
+        nested = self._match_override(assignment, network, edges, direction, memo, **config)
+        out[matches] = nested[matches]
+      else:
+        out[matches] = assignment
+    memo[key] = out
+    return out
 
-  def _subindex_edge(self, idx, label, mapping, direction = None):
-    value = self._extract_value(self._attribute_cache[label], idx, direction)
+  @staticmethod
+  def _match_rule(value, mapping):
     for condition, assignment in mapping["rules"].items():
       if condition(value):
-        if isinstance(assignment, dict):
-          # TODO: What if subindex is directed but attribute not (or vice versa)?
-          label = assignment["indicator"]
-          return self._subindex_edge(idx, label, assignment, direction)
-        else:
-          return assignment
+        return assignment
     return mapping["default"]
 
+  @staticmethod
+  def _apply_unique(data, func, *args):
+    # Apply a row-wise function only once per unique combination of values.
+    # The results are broadcasted back to all rows with that combination.
+    if data.empty:
+      return []
+    codes = np.column_stack([_factorize(data[c]) for c in data.columns])
+    _, first, inverse = np.unique(codes, axis = 0, return_index = True, return_inverse = True)
+    results = [func(data.iloc[i], *args) for i in first]
+    return [results[i] for i in inverse.ravel()]
+
   def _get_derived_attributes(self, network, attrs, read = True, write = True):
     if network.is_multigraph():
       E = network.edges(keys = True)
@@ -1014,4 +1670,12 @@ class NetascoreAssessor(Assessor):
         A[x] = a_data
     E = [[e, {k:A[k][e] for k in attrs if e in A[k]}] for e in E]
     keys, data = zip(*E)
-    return pd.DataFrame(data, index = keys)
\ No newline at end of file
+    return pd.DataFrame(data, index = keys)
+
+def _factorize(values):
+  # Unhashable values like lists (e.g. tags of merged ways) are factorized by
+  # their representation instead.
+  try:
+    return pd.factorize(values)[0]
+  except TypeError:
+    return pd.factorize(values.map(lambda x: (type(x).__name__, repr(x))))[0]
@@ -0,0 +1,116 @@
+import glob
+import os
+import sys
+
+from netapy import utils
+
+pd = utils.lazy_import("pandas")
+
+# Approximate memory usage in bytes, measured with CPython 3.11 and shapely 2.
+# These err on the high side, such that plans stay within the budget.
+# A derived value of an edge is held in a result dict and as edge attribute.
+VALUE_BYTES = 40
+GEOMETRY_BYTES = 250
+VERTEX_BYTES = 16
+
+# Chunks smaller than this make the per chunk overhead dominate.
+MIN_CHUNK_SIZE = 1000
+
+class MemoryPlan():
+
+  # Describes how an assessment is executed within a memory budget.
+  # Strategies are "single" (all edges at once), "chunked" (edges in spatial
+  # tiles of chunk_size edges) and "spill" (chunked, with intermediate columns
+  # written to files in spill_dir instead of kept as edge attributes, or
+  # discarded if there is no spill_dir).
+  def __init__(self, budget, available, estimates, strategy, chunk_size = None,
+               n_chunks = 1, spill_dir = None, reasons = None):
+    self.budget = budget
+    self.available = available
+    self.estimates = estimates
+    self.strategy = strategy
+    self.chunk_size = chunk_size
+    self.n_chunks = n_chunks
+    self.spill_dir = spill_dir
+    self.reasons = [] if reasons is None else reasons
+
+  def __repr__(self):
+    lines = [f"Memory plan: {self.strategy}"]
+    lines.append(f"  budget: {_format_bytes(self.budget)}, available: {_format_bytes(self.available)}")
+    for stage, (size, kind) in self.estimates.items():
+      lines.append(f"  {stage}: {_format_bytes(size)} ({kind})")
+    if self.chunk_size is not None:
+      lines.append(f"  chunks: {self.n_chunks} of at most {self.chunk_size} edges")
+    if self.spill_dir is not None:
+      lines.append(f"  spill directory: {self.spill_dir}")
+    lines.extend(f"  - {x}" for x in self.reasons)
+    return "\n".join(lines)
+
+  def read_spilled(self):
+    # Columns that were spilled to disk, indexed by edge key.
+    if self.spill_dir is None:
+      return None
+    files = sorted(glob.glob(os.path.join(self.spill_dir, "chunk-*.pkl")))
+    return pd.concat([pd.read_pickle(x) for x in files])
+
+def plan(budget, n_edges, estimates, spill_dir = None):
+  # Estimates map stages to a size in bytes for all edges and a kind.
+  # Fixed stages stay in memory regardless of chunking. Chunked stages scale
+  # with the chunk size. Spillable stages stay in memory unless spilled.
+  available = budget - get_memory_usage()
+  sizes = {k:sum(v[0] for v in estimates.values() if v[1] == k) for k in ["fixed", "chunked", "spillable"]}
+  total = sum(sizes.values())
+  config = {"budget": budget, "available": available, "estimates": estimates}
+  if total <= available:
+    reason = f"Estimated {_format_bytes(total)} fits in the available memory"
+    return MemoryPlan(strategy = "single", reasons = [reason], **config)
+  reasons = [f"Estimated {_format_bytes(total)} exceeds the available memory"]
+  resident = sizes["fixed"] + sizes["spillable"]
+  strategy = "chunked"
+  if resident >= available and sizes["spillable"] > 0:
+    if spill_dir is None:
+      reasons.append(f"Written columns alone would take {_format_bytes(resident)}, so they are discarded")
+    else:
+      reasons.append(f"Written columns alone would take {_format_bytes(resident)}, so they are spilled to disk")
+    resident = sizes["fixed"]
+    strategy = "spill"
+  if resident >= available:
+    reasons.append("Memory that does not scale with the chunk size exceeds the budget, using the smallest chunks")
+    chunk_size = MIN_CHUNK_SIZE
+  else:
+    per_edge = sizes["chunked"] / max(n_edges, 1)
+    chunk_size = max(int((available - resident) / max(per_edge, 1)), MIN_CHUNK_SIZE)
+    reasons.append(f"Chunks of {chunk_size} edges keep the estimate within the available memory")
+  if chunk_size >= n_edges:
+    if strategy == "chunked":
+      reasons.append("The network is smaller than a single chunk")
+      return MemoryPlan(strategy = "single", reasons = reasons, **config)
+    chunk_size = n_edges
+  if strategy == "spill" and spill_dir is not None:
+    os.makedirs(spill_dir, exist_ok = True)
+  n_chunks = -(-n_edges // chunk_size)
+  return MemoryPlan(strategy = strategy, chunk_size = chunk_size, n_chunks = n_chunks,
+                    spill_dir = spill_dir if strategy == "spill" else None,
+                    reasons = reasons, **config)
+
+def get_memory_usage():
+  # Resident memory of this process in bytes, or 0 if it can not be determined.
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, AttributeError):
+    pass
+  try:
+    import resource
+  except ImportError:
+    return 0
+  # This is the peak instead of the current usage, which is a safe upper bound.
+  usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return usage if sys.platform == "darwin" else usage * 1024
+
+def _format_bytes(size):
+  for unit in ["B", "KB", "MB", "GB"]:
+    if abs(size) < 1024:
+      return f"{size:.0f} {unit}"
+    size /= 1024
+  return f"{size:.1f} TB"
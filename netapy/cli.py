@@ -0,0 +1,254 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from netapy import __version__, utils
+from netapy.exceptions import NetapyNetworkError, NetapyProfileError
+
+logger = logging.getLogger(__name__)
+
+# Exit codes, such that schedulers can distinguish failures worth retrying.
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INPUT = 3
+EXIT_MEMORY = 4
+EXIT_INTERRUPTED = 130
+
+# Network shared with forked worker processes.
+_NETWORK = None
+
+def main(argv = None):
+  parser = _create_parser()
+  args = parser.parse_args(argv)
+  logging.basicConfig(
+    level = max(logging.WARNING - 10 * args.verbose, logging.DEBUG),
+    format = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+  )
+  try:
+    if args.profile_output is None:
+      run(args)
+    else:
+      import cProfile
+      profiler = cProfile.Profile()
+      try:
+        profiler.runcall(run, args)
+      finally:
+        profiler.dump_stats(args.profile_output)
+        logger.info(f"Wrote profiling statistics to '{args.profile_output}'")
+  except KeyboardInterrupt:
+    return EXIT_INTERRUPTED
+  except MemoryError:
+    logger.error("Out of memory")
+    return EXIT_MEMORY
+  except (NetapyNetworkError, NetapyProfileError, FileNotFoundError, ValueError) as e:
+    logger.error(str(e))
+    return EXIT_INPUT
+  except Exception:
+    logger.exception("Assessment failed")
+    return EXIT_FAILURE
+  return EXIT_OK
+
+def run(args):
+  with _osmnx_settings(args):
+    network = _load_network(args)
+  logger.info(f"Loaded network with {network.number_of_edges()} edges")
+  for layer in args.layer:
+    name, filepath = _parse_layer(layer)
+    network.add_layer_from_file(name, filepath)
+  # Layers are fetched up front, such that the osmnx cache applies to them,
+  # and forked workers do not each fetch them again.
+  with _osmnx_settings(args):
+    for profile in args.profiles or ["bike"]:
+      _create_assessor(profile, None)._fetch_required_layers(network)
+  _assess(network, args)
+  _write_output(network, args)
+  logger.info(f"Wrote output to '{args.output}'")
+
+def _osmnx_settings(args):
+  from netapy import networks
+  if args.cache_dir is None:
+    return nullcontext()
+  os.makedirs(args.cache_dir, exist_ok = True)
+  osmnx_cache = os.path.join(args.cache_dir, "osmnx")
+  return networks.osmnx_settings(use_cache = True, cache_folder = osmnx_cache)
+
+def _create_parser():
+  parser = argparse.ArgumentParser(
+    prog = "netapy",
+    description = "Assess street network suitability for sustainable transport modes"
+  )
+  area = parser.add_mutually_exclusive_group(required = True)
+  area.add_argument("--place", help = "name of a place to geocode")
+  area.add_argument("--bbox", nargs = 4, type = float,
+                    metavar = ("WEST", "SOUTH", "EAST", "NORTH"),
+                    help = "bounding box in EPSG:4326")
+  area.add_argument("--polygon", metavar = "FILE",
+                    help = "vector file with the polygon(s) of the area")
+  area.add_argument("--extract", metavar = "FILE",
+                    help = "OSM XML extract")
+  parser.add_argument("-o", "--output", required = True,
+                      help = "output file, written as GeoParquet unless the extension says otherwise")
+  parser.add_argument("-p", "--profile", action = "append", dest = "profiles",
+                      help = "name of a default profile or path to a profile file (repeatable, default: bike)")
+  parser.add_argument("--layer", action = "append", default = [], metavar = "NAME=FILE",
+                      help = "read a network layer from file instead of fetching it (repeatable)")
+  parser.add_argument("--simplify", action = "store_true",
+                      help = "assess merged segments instead of raw edges")
+  parser.add_argument("--compact", action = "store_true",
+                      help = "store edge attributes column-wise to reduce memory usage")
+  parser.add_argument("--workers", type = _positive_int, default = 1,
+                      help = "number of processes assessing profiles in parallel")
+  parser.add_argument("--chunk-size", type = _positive_int, default = 100000,
+                      help = "number of edges written per output batch")
+  parser.add_argument("--cache-dir",
+                      help = "directory to cache OSM responses and derived attributes in")
+  parser.add_argument("--memory-budget", type = _positive_int, metavar = "MB",
+                      help = "maximum memory usage per process in megabytes, large networks are assessed in chunks to stay within it")
+  parser.add_argument("--coverage-resolution", type = _positive_float, metavar = "METERS",
+                      help = "approximate building and green cover on a grid with cells of this size instead of computing it exactly")
+  parser.add_argument("--layer-tolerance", type = _non_negative_float, metavar = "METERS",
+                      help = "simplify building and green area polygons within this tolerance before computing their cover")
+  parser.add_argument("--profile-output", metavar = "FILE",
+                      help = "write cProfile statistics to this file")
+  parser.add_argument("-v", "--verbose", action = "count", default = 0,
+                      help = "increase logging verbosity")
+  parser.add_argument("--version", action = "version", version = f"%(prog)s {__version__}")
+  return parser
+
+def _positive_int(value):
+  value = int(value)
+  if value < 1:
+    raise argparse.ArgumentTypeError(f"Expected a positive integer, got {value}")
+  return value
+
+def _positive_float(value):
+  value = float(value)
+  if value <= 0:
+    raise argparse.ArgumentTypeError(f"Expected a positive number, got {value}")
+  return value
+
+def _non_negative_float(value):
+  value = float(value)
+  if value < 0:
+    raise argparse.ArgumentTypeError(f"Expected a non-negative number, got {value}")
+  return value
+
+def _parse_layer(value):
+  name, sep, filepath = value.partition("=")
+  if not sep or not name or not filepath:
+    raise ValueError(f"Invalid layer specification: '{value}'")
+  return name, filepath
+
+def _load_network(args):
+  from netapy.networks import NetascoreNetwork
+  kwargs = {"compact": args.compact}
+  if args.place is not None:
+    return NetascoreNetwork.from_place(args.place, **kwargs)
+  if args.bbox is not None:
+    return NetascoreNetwork.from_bbox(args.bbox, **kwargs)
+  if args.extract is not None:
+    if not os.path.exists(args.extract):
+      raise FileNotFoundError(f"No such file: '{args.extract}'")
+    return NetascoreNetwork.from_file(args.extract, **kwargs)
+  gpd = utils.lazy_import("geopandas")
+  polygons = gpd.read_file(args.polygon).to_crs(4326)
+  return NetascoreNetwork.from_polygon(polygons.union_all(), **kwargs)
+
+def _load_profile(value):
+  from netapy import defaults
+  from netapy.profiles import NetascoreProfile
+  if value in defaults.NETASCORE_PROFILES:
+    return value
+  if not os.path.exists(value):
+    raise ValueError(f"Unknown profile: '{value}'")
+  profile = NetascoreProfile.from_file(value)
+  # Index columns are named after the profile, so file profiles need a name too.
+  if profile.name is None:
+    profile.name = os.path.splitext(os.path.basename(value))[0]
+  return profile
+
+def _create_assessor(profile, cache_dir, memory_budget = None, coverage_resolution = None,
+                     layer_tolerance = None):
+  from netapy.assessors import NetascoreAssessor
+  if cache_dir is None:
+    store = None
+  else:
+    store = os.path.join(cache_dir, "attributes.sqlite")
+  return NetascoreAssessor(_load_profile(profile), attribute_store = store,
+                           memory_budget = memory_budget,
+                           coverage_resolution = coverage_resolution,
+                           layer_tolerance = layer_tolerance)
+
+def _assess(network, args):
+  profiles = args.profiles or ["bike"]
+  options = (args.memory_budget, args.coverage_resolution, args.layer_tolerance)
+  jobs = [(p, args.cache_dir, args.simplify, *options) for p in profiles]
+  workers = min(args.workers, len(jobs))
+  if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+    logger.warning("Parallel assessment requires the fork start method, using a single worker")
+    workers = 1
+  if workers > 1:
+    # Forked workers inherit the network without pickling it.
+    # Only the index values are sent back and written here.
+    # They inherit all loaded modules as well, instead of each importing them.
+    from netapy import assessors
+    utils.load_lazy_modules()
+    global _NETWORK
+    _NETWORK = network
+    try:
+      context = multiprocessing.get_context("fork")
+      with ProcessPoolExecutor(workers, mp_context = context) as executor:
+        results = list(executor.map(_assess_profile, jobs))
+    finally:
+      _NETWORK = None
+  else:
+    results = [_assess_profile(job, network) for job in jobs]
+  for (profile, cache_dir, *_), metadata in zip(jobs, results):
+    assessor = _create_assessor(profile, cache_dir)
+    assessor._write_to_network(metadata, network)
+    logger.info(f"Assessed profile '{profile}'")
+
+def _assess_profile(job, network = None):
+  profile, cache_dir, simplify, *options = job
+  network = _NETWORK if network is None else network
+  assessor = _create_assessor(profile, cache_dir, *options)
+  # Derived attributes are shared by all profiles.
+  # Without an attribute store they are read back from the network instead.
+  config = {
+    "write": False,
+    "read_attrs": assessor.attribute_store is None,
+    "write_attrs": True
+  }
+  if simplify:
+    segments, members = network._get_segments()
+    metadata = assessor.run(segments, **config)
+    for direction, data in metadata["data"].items():
+      metadata["data"][direction] = {e:v for s, v in data.items() for e in members[s]}
+  else:
+    metadata = assessor.run(network, **config)
+  if assessor.attribute_store is not None:
+    assessor.attribute_store.close()
+  return metadata
+
+def _write_output(network, args):
+  names = set()
+  for profile in (args.profiles or ["bike"]):
+    names.update(_create_assessor(profile, None)._find_index_colnames())
+  edges = network._get_edge_frame("osmid", *sorted(names)).reset_index()
+  # Columns of mixed types (like lists of OSM ids) can not be written as such.
+  edges["osmid"] = edges["osmid"].astype(str)
+  if args.output.lower().endswith((".parquet", ".geoparquet")):
+    edges.to_parquet(args.output, row_group_size = args.chunk_size)
+  else:
+    for start in range(0, max(len(edges), 1), args.chunk_size):
+      mode = "w" if start == 0 else "a"
+      edges.iloc[start:(start + args.chunk_size)].to_file(args.output, mode = mode)
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,7 +1,7 @@
-from netapy.profiles import NetascoreProfile
-
-NETASCORE_PROFILES = {
-  "bike": NetascoreProfile({
+# Default profiles are only constructed when NETASCORE_PROFILES is first accessed.
+# This keeps importing netapy free of the profile parsing machinery.
+_NETASCORE_PROFILE_DEFINITIONS = {
+  "bike": {
     "version": 1.1,
     "weights": {
       "bicycle_infrastructure": 0.4,
@@ -202,8 +202,8 @@ NETASCORE_PROFILES = {
         }
       }
     ]
-  }, name = "bike"),
-  "walk": NetascoreProfile({
+  },
+  "walk": {
     "version": 1.1,
     "weights": {
       "bicycle_infrastructure": None,
@@ -404,7 +404,7 @@ NETASCORE_PROFILES = {
         }
       }
     ]
-  }, name = "walk")
+  }
 }
 
 NETASCORE_NAMING_CONFIG = {
@@ -418,6 +418,27 @@ NETASCORE_NAMING_CONFIG = {
   "backward_suffix": ":backward"
 }
 
+# Edge attributes that each attribute derivation depends on.
+# Derivations not listed here can not be stored in an attribute store.
+NETASCORE_ATTRIBUTE_INPUTS = {
+  "bridge": ["bridge"],
+  "stairs": ["highway"],
+  "tunnel": ["tunnel"],
+  "bicycle_infrastructure": ["highway", "cycleway", "bicycle", "foot"],
+  "gradient": ["grade"],
+  "road_category": ["highway", "access", "bicycle", "foot", "motor_vehicle",
+                    "maxspeed", "tracktype", "surface"],
+  "number_lanes": ["lanes", "lanes:forward", "lanes:backward"],
+  "width": ["width"],
+  "pavement": ["surface"],
+  "crossings": ["geometry"],
+  "buildings": ["geometry"],
+  "facilities": ["geometry"],
+  "greenness": ["geometry"],
+  "water": ["geometry"],
+  "noise": ["geometry"]
+}
+
 NETASCORE_STREET_KEYS = [
   "name",
   "highway",
@@ -546,4 +567,12 @@ NETASCORE_WATER_QUERY = {
   "waterway": True,
   "natural": "water",
   "tunnel": False
-}
\ No newline at end of file
+}
+
+def __getattr__(name):
+  if name == "NETASCORE_PROFILES":
+    from netapy.profiles import NetascoreProfile
+    profiles = {k:NetascoreProfile(v, name = k) for k, v in _NETASCORE_PROFILE_DEFINITIONS.items()}
+    globals()[name] = profiles
+    return profiles
+  raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
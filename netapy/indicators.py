@@ -0,0 +1,112 @@
+import inspect
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Entry point group through which installed packages provide indicators.
+ENTRY_POINT_GROUP = "netapy.indicators"
+
+# Registered indicators by label, filled with entry points on first access.
+_REGISTRY = {}
+_ENTRY_POINTS_LOADED = False
+
+class Indicator():
+
+  # A custom indicator derived by a batch kernel.
+  # The kernel receives a dataframe with one row per edge and one column per
+  # input, and returns an array with one value per row. Inputs are names of
+  # edge attributes, labels of other indicators (built-in or custom) whose
+  # derived values are used, or "geometry" for the projected edge geometries.
+  # Layers are names of network layers that are passed to the kernel as
+  # keyword arguments, with vector layers in the projected CRS.
+  # Undirected indicators are derived once per pair of reverse edges.
+  # Directed indicators are derived per direction, with the values of directed
+  # inputs of that direction, and the kernel also receives the direction.
+  def __init__(self, label, kernel, inputs = None, layers = None, directed = False):
+    self.label = label
+    self.kernel = kernel
+    self.inputs = [] if inputs is None else list(inputs)
+    self.layers = [] if layers is None else list(layers)
+    self.directed = directed
+
+  def __repr__(self):
+    return f"Indicator('{self.label}', inputs = {self.inputs}, layers = {self.layers}, directed = {self.directed})"
+
+  @property
+  def label(self):
+    return self._label
+
+  @label.setter
+  def label(self, value):
+    if not isinstance(value, str) or not value.isidentifier():
+      raise ValueError(f"Indicator label should be a valid identifier, got '{value}'")
+    self._label = value
+
+  @property
+  def kernel(self):
+    return self._kernel
+
+  @kernel.setter
+  def kernel(self, value):
+    if not callable(value):
+      raise ValueError(f"Kernel of indicator '{self.label}' is not callable")
+    self._kernel = value
+
+  @property
+  def rules(self):
+    # Source code of the kernel, such that stored values are invalidated when it changes.
+    try:
+      return inspect.getsource(self.kernel)
+    except (OSError, TypeError):
+      return self.kernel.__code__.co_code
+
+def register(obj, replace = False):
+  # Register an indicator for all assessors.
+  from netapy.assessors import NetascoreAssessor
+  if hasattr(NetascoreAssessor, f"derive_{obj.label}"):
+    raise ValueError(f"Indicator '{obj.label}' conflicts with a built-in attribute")
+  if obj.label in _REGISTRY and not replace:
+    raise ValueError(f"Indicator '{obj.label}' is already registered")
+  _REGISTRY[obj.label] = obj
+  return obj
+
+def unregister(label):
+  try:
+    del _REGISTRY[label]
+  except KeyError:
+    raise ValueError(f"Indicator '{label}' is not registered")
+
+def indicator(label, inputs = None, layers = None, directed = False, replace = False):
+  # Decorator that registers a function as kernel of an indicator.
+  def decorator(func):
+    register(Indicator(label, func, inputs, layers, directed), replace = replace)
+    return func
+  return decorator
+
+def get_registered():
+  _load_entry_points()
+  return dict(_REGISTRY)
+
+def _load_entry_points():
+  # Entry points may refer to an indicator or to a list of indicators.
+  # Failing entry points are skipped, such that one broken package does not
+  # break all assessments.
+  global _ENTRY_POINTS_LOADED
+  if _ENTRY_POINTS_LOADED:
+    return
+  _ENTRY_POINTS_LOADED = True
+  from importlib.metadata import entry_points
+  entries = entry_points()
+  # Selecting by group through keyword arguments requires Python 3.10.
+  if hasattr(entries, "select"):
+    entries = entries.select(group = ENTRY_POINT_GROUP)
+  else:
+    entries = entries.get(ENTRY_POINT_GROUP, [])
+  for entry in entries:
+    try:
+      obj = entry.load()
+      for x in (obj if isinstance(obj, (list, tuple)) else [obj]):
+        if x.label not in _REGISTRY:
+          register(x)
+    except Exception:
+      logger.exception(f"Could not load indicator from entry point '{entry.name}'")
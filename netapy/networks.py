@@ -1,18 +1,276 @@
-import geopandas as gpd
-import pandas as pd
-import osmnx as ox
-import copy
+import json
 import logging
+import threading
 
 from abc import abstractmethod
-from networkx import MultiDiGraph
-from pyproj import CRS
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from functools import cached_property
+from importlib.util import find_spec
 
-from netapy import defaults
+from netapy import accessibility, defaults, routing, utils
+from netapy.exceptions import NetapyNetworkError
+
+# Heavy dependencies are loaded on first use to keep importing netapy fast.
+gpd = utils.lazy_import("geopandas")
+np = utils.lazy_import("numpy")
+pd = utils.lazy_import("pandas")
+ox = utils.lazy_import("osmnx")
+pyproj = utils.lazy_import("pyproj")
+shapely = utils.lazy_import("shapely")
+# Networks are networkx graphs, such that defining them needs networkx anyway.
+# Importing netapy itself does not import this module.
+nx = utils.lazy_import("networkx")
 
 logger = logging.getLogger(__name__)
 
-class Network(MultiDiGraph):
+# Layers known to every network. Other layers can be added from files.
+_LAYERS = ["buildings", "crossings", "facilities", "greenness", "water", "noise"]
+
+# The osmnx settings are module-level globals shared by all threads.
+# Any temporary change to them should go through osmnx_settings().
+# Each changed setting is counted by the number of scopes that use it, such
+# that scopes asking for the same values run concurrently, and only scopes
+# asking for different values of a setting wait until it is restored.
+_OSMNX_SETTINGS_CONDITION = threading.Condition()
+_OSMNX_SETTINGS_ACTIVE = {}
+
+@contextmanager
+def osmnx_settings(**settings):
+  thread = threading.get_ident()
+  with _OSMNX_SETTINGS_CONDITION:
+    while True:
+      conflicts = [k for k, v in settings.items()
+                   if k in _OSMNX_SETTINGS_ACTIVE and _OSMNX_SETTINGS_ACTIVE[k]["value"] != v]
+      if not conflicts:
+        break
+      if any(thread in _OSMNX_SETTINGS_ACTIVE[k]["threads"] for k in conflicts):
+        raise RuntimeError(f"Nested scopes change osmnx settings {conflicts} to different values")
+      _OSMNX_SETTINGS_CONDITION.wait()
+    for k, v in settings.items():
+      if k not in _OSMNX_SETTINGS_ACTIVE:
+        _OSMNX_SETTINGS_ACTIVE[k] = {"value": v, "previous": getattr(ox.settings, k), "threads": []}
+        setattr(ox.settings, k, v)
+      _OSMNX_SETTINGS_ACTIVE[k]["threads"].append(thread)
+  try:
+    yield
+  finally:
+    with _OSMNX_SETTINGS_CONDITION:
+      for k in settings:
+        active = _OSMNX_SETTINGS_ACTIVE[k]
+        active["threads"].remove(thread)
+        if not active["threads"]:
+          setattr(ox.settings, k, active["previous"])
+          del _OSMNX_SETTINGS_ACTIVE[k]
+      _OSMNX_SETTINGS_CONDITION.notify_all()
+
+class EdgeAttributeStore():
+
+  def __init__(self, capacity = 1024):
+    self._capacity = capacity
+    self._size = 0
+    self._columns = {}
+    # Columns whose arrays are shared with an overlay or its base.
+    self._shared = set()
+
+  def __len__(self):
+    return self._size
+
+  @property
+  def columns(self):
+    return list(self._columns.keys())
+
+  def new_view(self):
+    # Edge ids are never reused, also not when an edge is removed.
+    idx = self._size
+    self._size += 1
+    if self._size > self._capacity:
+      self._grow(self._capacity * 2)
+    return EdgeAttributeView(self, idx)
+
+  def overlay(self):
+    # Create a copy-on-write copy of the store.
+    # All columns are shared until they are changed in either of both stores,
+    # which then copies only that column.
+    new = self.__class__.__new__(self.__class__)
+    new._capacity = self._capacity
+    new._size = self._size
+    new._columns = dict(self._columns)
+    new._shared = set(self._columns)
+    self._shared.update(self._columns)
+    return new
+
+  def get(self, name, idx):
+    try:
+      values, present = self._columns[name]
+    except KeyError:
+      raise KeyError(name)
+    if not present[idx]:
+      raise KeyError(name)
+    return values[idx]
+
+  def set(self, name, idx, value):
+    try:
+      values, present = self._columns[name]
+    except KeyError:
+      values, present = self._add_column(name, value)
+    if name in self._shared:
+      values, present = self._unshare(name)
+    # Columns are stored as float arrays as long as they only contain floats.
+    # As soon as any other value is assigned they are converted to object arrays.
+    if values.dtype != object and not self._is_float(value):
+      values = values.astype(object)
+      values[~present] = None
+      self._columns[name] = (values, present)
+    values[idx] = value
+    present[idx] = True
+
+  def delete(self, name, idx):
+    try:
+      values, present = self._columns[name]
+    except KeyError:
+      raise KeyError(name)
+    if not present[idx]:
+      raise KeyError(name)
+    if name in self._shared:
+      values, present = self._unshare(name)
+    present[idx] = False
+    if values.dtype == object:
+      values[idx] = None
+
+  def keys(self, idx):
+    return [k for k, (_, present) in self._columns.items() if present[idx]]
+
+  def drop_columns(self, *names):
+    for name in names:
+      self._columns.pop(name, None)
+      self._shared.discard(name)
+
+  def _add_column(self, name, value):
+    dtype = float if self._is_float(value) else object
+    values = np.full(self._capacity, np.nan if dtype is float else None, dtype = dtype)
+    present = np.zeros(self._capacity, dtype = bool)
+    self._columns[name] = (values, present)
+    return values, present
+
+  def _grow(self, capacity):
+    for name, (values, present) in self._columns.items():
+      fill = np.nan if values.dtype == float else None
+      new_values = np.full(capacity, fill, dtype = values.dtype)
+      new_values[:self._capacity] = values
+      new_present = np.zeros(capacity, dtype = bool)
+      new_present[:self._capacity] = present
+      self._columns[name] = (new_values, new_present)
+    self._capacity = capacity
+    self._shared.clear()
+
+  def _unshare(self, name):
+    values, present = self._columns[name]
+    self._columns[name] = (values.copy(), present.copy())
+    self._shared.discard(name)
+    return self._columns[name]
+
+  @staticmethod
+  def _is_float(value):
+    return isinstance(value, (float, np.floating))
+
+
+class EdgeAttributeView(MutableMapping):
+
+  __slots__ = ("_store", "_idx")
+
+  def __init__(self, store, idx):
+    self._store = store
+    self._idx = idx
+
+  def __getitem__(self, key):
+    return self._store.get(key, self._idx)
+
+  def __setitem__(self, key, value):
+    self._store.set(key, self._idx, value)
+
+  def __delitem__(self, key):
+    self._store.delete(key, self._idx)
+
+  def __iter__(self):
+    return iter(self._store.keys(self._idx))
+
+  def __len__(self):
+    return len(self._store.keys(self._idx))
+
+  def __repr__(self):
+    return repr(dict(self))
+
+  def copy(self):
+    return dict(self)
+
+
+class AttributeOverlay(MutableMapping):
+
+  # Changes and deletions are recorded in the overlay and never reach the base.
+  # Both are only allocated once something is actually changed.
+  __slots__ = ("_base", "_changes", "_deleted")
+
+  def __init__(self, base):
+    self._base = base
+    self._changes = None
+    self._deleted = None
+
+  def __getitem__(self, key):
+    if self._changes is not None and key in self._changes:
+      return self._changes[key]
+    if self._deleted is not None and key in self._deleted:
+      raise KeyError(key)
+    return self._base[key]
+
+  def __setitem__(self, key, value):
+    if self._changes is None:
+      self._changes = {}
+    self._changes[key] = value
+    if self._deleted is not None:
+      self._deleted.discard(key)
+
+  def __delitem__(self, key):
+    if key not in self:
+      raise KeyError(key)
+    if self._changes is not None:
+      self._changes.pop(key, None)
+    if key in self._base:
+      if self._deleted is None:
+        self._deleted = set()
+      self._deleted.add(key)
+
+  def __iter__(self):
+    changes = {} if self._changes is None else self._changes
+    deleted = set() if self._deleted is None else self._deleted
+    for key in self._base:
+      if key not in changes and key not in deleted:
+        yield key
+    yield from changes
+
+  def __len__(self):
+    return sum(1 for _ in self)
+
+  def __repr__(self):
+    return repr(dict(self))
+
+  def copy(self):
+    return dict(self)
+
+
+class RasterLayer():
+
+  # Raster layers are not loaded into memory when added to a network.
+  # Only the window covering the network is read when values are sampled.
+  def __init__(self, filepath, band = 1):
+    self.filepath = filepath
+    self.band = band
+
+  def __repr__(self):
+    return f"RasterLayer('{self.filepath}', band = {self.band})"
+
+
+class Network(nx.MultiDiGraph):
 
   def __init__(self, obj):
     super(Network, self).__init__(obj)
@@ -26,10 +284,20 @@ class NetascoreNetwork(Network):
     
   def __init__(self, obj, query_type, query_kwargs, buildings = False,
                facilities = False, greenness = False, water = False,
-               projected_crs = None):
+               projected_crs = None, compact = False):
+    # In compact mode edge attributes are stored column-wise in a shared store.
+    # Each edge then only holds a lightweight view into that store.
+    if compact:
+      self._edge_store = EdgeAttributeStore()
+      self.edge_attr_dict_factory = self._edge_store.new_view
+    else:
+      self._edge_store = None
     super(NetascoreNetwork, self).__init__(obj)
+    self._geometry_cache = {}
+    self._geometry_signature = None
     self._query_type = query_type
     self._query_kwargs = query_kwargs
+    self._layer_names = list(_LAYERS)
     for layer in ["buildings", "facilities", "greenness", "water"]:
       if locals()[layer]:
         getattr(self, f"fetch_{layer}")()
@@ -41,6 +309,10 @@ class NetascoreNetwork(Network):
     else:
       self.projected_crs = projected_crs
 
+  @property
+  def compact(self):
+    return self._edge_store is not None
+
   @property
   def query_type(self):
     return self._query_type
@@ -95,12 +367,10 @@ class NetascoreNetwork(Network):
 
   @projected_crs.setter
   def projected_crs(self, value):
-    self._projected_crs = CRS.from_user_input(value)
+    self._projected_crs = pyproj.CRS.from_user_input(value)
 
   @classmethod
   def from_place(cls, query, which_result = None, **kwargs):
-    DEFAULT_STREET_KEYS = ox.settings.useful_tags_way
-    ox.settings.useful_tags_way = defaults.NETASCORE_STREET_KEYS
     qtype = "place"
     qkwargs = {
       "query": query,
@@ -108,28 +378,20 @@ class NetascoreNetwork(Network):
       "simplify": False,
       "which_result": which_result
     }
-    obj = cls(ox.graph_from_place(**qkwargs), qtype, qkwargs, **kwargs)
-    ox.settings.useful_tags_way = DEFAULT_STREET_KEYS
-    return obj
+    return cls._from_query(ox.graph_from_place, qtype, qkwargs, **kwargs)
 
   @classmethod
   def from_polygon(cls, polygon, **kwargs):
-    DEFAULT_STREET_KEYS = ox.settings.useful_tags_way
-    ox.settings.useful_tags_way = defaults.NETASCORE_STREET_KEYS
     qtype = "polygon"
     qkwargs = {
       "polygon": polygon,
       "network_type": "all",
       "simplify": False
     }
-    obj = cls(ox.graph_from_polygon(**qkwargs), qtype, qkwargs, **kwargs)
-    ox.settings.useful_tags_way = DEFAULT_STREET_KEYS
-    return obj
+    return cls._from_query(ox.graph_from_polygon, qtype, qkwargs, **kwargs)
 
   @classmethod
   def from_point(cls, point, dist = 1000, **kwargs):
-    DEFAULT_STREET_KEYS = ox.settings.useful_tags_way
-    ox.settings.useful_tags_way = defaults.NETASCORE_STREET_KEYS
     qtype = "point"
     qkwargs = {
       "center_point": point,
@@ -137,26 +399,36 @@ class NetascoreNetwork(Network):
       "simplify": False,
       "dist": dist
     }
-    obj = cls(ox.graph_from_point(**qkwargs), qtype, qkwargs, **kwargs)
-    ox.settings.useful_tags_way = DEFAULT_STREET_KEYS
-    return obj
+    return cls._from_query(ox.graph_from_point, qtype, qkwargs, **kwargs)
 
   @classmethod
   def from_bbox(cls, coords, **kwargs):
-    DEFAULT_STREET_KEYS = ox.settings.useful_tags_way
-    ox.settings.useful_tags_way = defaults.NETASCORE_STREET_KEYS
     qtype = "bbox"
     qkwargs = {k:v for k, v in zip(["west", "south", "east", "north"], coords)}
     qkwargs["network_type"] = "all"
     qkwargs["simplify"] = False
-    obj = cls(ox.graph_from_bbox(**qkwargs), qtype, qkwargs, **kwargs)
-    ox.settings.useful_tags_way = DEFAULT_STREET_KEYS
-    return obj
+    return cls._from_query(ox.graph_from_bbox, qtype, qkwargs, **kwargs)
+
+  @classmethod
+  def _from_query(cls, loader, query_type, query_kwargs, **kwargs):
+    # Networks may be loaded in parallel threads.
+    utils.load_lazy_modules()
+    # Only the graph query itself needs the netascore street keys.
+    # Queries of other threads run concurrently, since they use the same keys.
+    # Constructing the network (e.g. fetching layers) happens outside the scope.
+    with osmnx_settings(useful_tags_way = defaults.NETASCORE_STREET_KEYS):
+      graph = loader(**query_kwargs)
+    return cls(graph, query_type, query_kwargs, **kwargs)
 
   @classmethod
   def from_file(cls, filepath, **kwargs):
-    # TODO: Create workflow to load street network from OSM file.
-    raise NotImplementedError()
+    # Reads an OSM XML extract, e.g. as exported by osmium or JOSM.
+    qtype = "file"
+    qkwargs = {
+      "filepath": filepath,
+      "simplify": False
+    }
+    return cls._from_query(ox.graph_from_xml, qtype, qkwargs, **kwargs)
 
   def fetch_layer(self, name, query):
     getattr(self, f"_fetch_layer_from_{self.query_type}")(name, query)
@@ -182,8 +454,9 @@ class NetascoreNetwork(Network):
     setattr(self, name, ox.features_from_bbox(tags = query, **kwargs))
 
   def _fetch_layer_from_file(self, name, query):
-    # TODO: Create workflow to load geometries from OSM file.
-    raise NotImplementedError()
+    kws = ["filepath"]
+    kwargs = {k:v for k, v in self.query_kwargs.items() if k in kws}
+    setattr(self, name, ox.features_from_xml(tags = query, **kwargs))
 
   def fetch_buildings(self):
     self.fetch_layer("buildings", defaults.NETASCORE_BUILDINGS_QUERY)
@@ -200,11 +473,45 @@ class NetascoreNetwork(Network):
   def fetch_water(self):
     self.fetch_layer("water", defaults.NETASCORE_WATER_QUERY)
 
-  def add_layer_from_file(self, name, filepath, **kwargs):
-    setattr(self, name, gpd.read_file(filepath, **kwargs))
+  def add_layer_from_file(self, name, filepath, columns = None, clip = True,
+                          buffer = 100, **kwargs):
+    # By default only features within the buffered network extent are read.
+    # Geometries are always read, other columns only if requested.
+    extent = self._get_extent(buffer) if clip else None
+    if str(filepath).lower().endswith((".parquet", ".geoparquet")):
+      layer = self._read_parquet_layer(filepath, columns, extent, **kwargs)
+    else:
+      if extent is not None and "mask" not in kwargs:
+        kwargs.setdefault("bbox", extent)
+      if columns is not None:
+        kwargs["columns"] = columns
+      if self._uses_pyogrio(kwargs.get("engine")):
+        kwargs.setdefault("use_arrow", find_spec("pyarrow") is not None)
+      layer = gpd.read_file(filepath, **kwargs)
+    self._set_layer(name, layer)
 
-  def add_noise(self, filepath, **kwargs):
-    self.add_layer_from_file("noise", filepath, **kwargs)
+  def add_layer_from_raster(self, name, filepath, band = 1):
+    self._set_layer(name, RasterLayer(filepath, band))
+
+  def _set_layer(self, name, layer):
+    # Custom layers are remembered, such that derived networks inherit them.
+    # The list is replaced instead of extended, since copies share it.
+    if name not in self._layer_names:
+      self._layer_names = self._layer_names + [name]
+    setattr(self, name, layer)
+
+  def add_noise(self, filepath, raster = False, **kwargs):
+    if raster:
+      self.add_layer_from_raster("noise", filepath, **kwargs)
+    else:
+      kwargs.setdefault("columns", ["noise"])
+      self.add_layer_from_file("noise", filepath, **kwargs)
+
+  def add_greenness(self, filepath, raster = False, **kwargs):
+    if raster:
+      self.add_layer_from_raster("greenness", filepath, **kwargs)
+    else:
+      self.add_layer_from_file("greenness", filepath, **kwargs)
 
   def write_elevation(self, filepath, inplace = True, **kwargs):
     elevated = ox.elevation.add_node_elevations_raster(self, filepath, **kwargs)
@@ -215,9 +522,17 @@ class NetascoreNetwork(Network):
     else:
       return graded
 
-  def assess(self, assessor, inplace = True, **config):
-    network = self if inplace else copy.deepcopy(self)
-    metadata = assessor.run(network, **config)
+  def assess(self, assessor, inplace = True, simplify = False, **config):
+    network = self if inplace else self._overlay()
+    if simplify:
+      # Assess merged segments instead of raw edges and project results back.
+      segments, members = network._get_segments()
+      metadata = assessor.run(segments, **config)
+      network._project_from_segments(segments, members)
+      for direction, data in metadata["data"].items():
+        metadata["data"][direction] = {e:v for s, v in data.items() for e in members[s]}
+    else:
+      metadata = assessor.run(network, **config)
     if config.get("write", True):
       name_fw = metadata["name"]["forward"]
       name_bw = metadata["name"]["backward"]
@@ -226,16 +541,323 @@ class NetascoreNetwork(Network):
       return network
 
   def clean(self, assessor, inplace = True, **config):
-    network = self if inplace else copy.deepcopy(self)
+    network = self if inplace else self._overlay()
     assessor.clean(network, **config)
     if not inplace:
       return network
 
-  def _get_edge_attributes(self, *attrs):
+  def _get_segments(self):
+    # Merge chains of edges with identical attributes into single segments.
+    # Returns a network of segments and a mapping from segment to edge keys.
+    G = nx.MultiDiGraph()
+    G.graph.update(self.graph)
+    members = {}
+    interior = {n for n in self.nodes if self._is_chain_node(n)}
+    visited = set()
+    for u, v, k in self.edges(keys = True):
+      # Chains start at edges leaving a node that is not a chain interior node.
+      if u in interior:
+        continue
+      chain = [(u, v, k)]
+      while v in interior:
+        w = next(x for x in self._succ[v] if x != chain[-1][0])
+        chain.append((v, w, next(iter(self._succ[v][w]))))
+        v = w
+      visited.update(chain)
+      members[self._add_segment(G, chain)] = chain
+    # Edges in closed chains without any endpoint remain single segments.
+    for e in self.edges(keys = True):
+      if e not in visited:
+        members[self._add_segment(G, [e])] = [e]
+    return self._derive_network(G), members
+
+  def _get_edge_tiles(self, size):
+    # Split the edges into tiles of at most the given number of edges.
+    # Edges are ordered along a Z-order curve through their start nodes,
+    # such that the edges in a tile are close to each other.
+    edges = list(self.edges(keys = True))
+    coords = {n:(d["x"], d["y"]) for n, d in self.nodes(data = True)}
+    xy = np.array([coords[e[0]] for e in edges], dtype = float).reshape(-1, 2)
+    order = np.argsort(self._morton_codes(xy[:, 0], xy[:, 1]), kind = "stable")
+    return [[edges[i] for i in order[j:(j + size)]] for j in range(0, len(edges), size)]
+
+  @staticmethod
+  def _morton_codes(x, y):
+    # Interleave the bits of coordinates quantized to 16 bits.
+    def spread(values):
+      lower = values.min() if len(values) else 0
+      extent = (values.max() - lower) if len(values) else 0
+      v = ((values - lower) / (extent or 1) * 65535).astype(np.uint64)
+      for shift, mask in [(8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)]:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+      return v
+    return spread(x) | (spread(y) << np.uint64(1))
+
+  def _clip_layers(self, buffer = 100):
+    # Restrict vector layers to the features near the edges of this network.
+    extent = self._get_extent(buffer)
+    for name in self._layer_names:
+      layer = getattr(self, name, None)
+      if not isinstance(layer, gpd.GeoDataFrame) or layer.crs is None:
+        continue
+      area = extent.to_crs(layer.crs).iloc[0]
+      matches = layer.sindex.query(area, predicate = "intersects")
+      setattr(self, name, layer.iloc[np.sort(matches)])
+
+  def _get_subnetwork(self, edges):
+    # Create a separate network containing only the given edges.
+    # Edge keys, attributes and layers are the same as in this network.
+    G = nx.MultiDiGraph()
+    G.graph.update(self.graph)
+    for u, v, k in edges:
+      for n in [u, v]:
+        if n not in G:
+          G.add_node(n, **self._node[n])
+      G.add_edge(u, v, key = k, **self._succ[u][v][k])
+    return self._derive_network(G)
+
+  def _derive_network(self, G):
+    network = self.__class__(G, self.query_type, self.query_kwargs,
+                             projected_crs = self.projected_crs)
+    network._layer_names = list(self._layer_names)
+    for name in self._layer_names:
+      setattr(network, name, getattr(self, name, None))
+    return network
+
+  def _is_chain_node(self, n):
+    # A node is in the interior of a chain if it connects exactly two other
+    # nodes, and every edge entering it continues into exactly one edge that
+    # leaves it towards the other neighbour and has identical attributes.
+    nbrs = set(self._succ[n]) | set(self._pred[n])
+    if n in nbrs or len(nbrs) != 2:
+      return False
+    if any(len(x) != 1 for x in self._succ[n].values()):
+      return False
+    if any(len(x) != 1 for x in self._pred[n].values()):
+      return False
+    if len(self._succ[n]) != len(self._pred[n]):
+      return False
+    for u, keydict in self._pred[n].items():
+      w = next(x for x in nbrs if x != u)
+      if w not in self._succ[n]:
+        return False
+      data_in = next(iter(keydict.values()))
+      data_out = next(iter(self._succ[n][w].values()))
+      if self._edge_fingerprint(data_in) != self._edge_fingerprint(data_out):
+        return False
+    return True
+
+  @staticmethod
+  def _edge_fingerprint(data):
+    skip = ["geometry", "length", "osmid"]
+    return sorted((k, repr(v)) for k, v in data.items() if k not in skip)
+
+  def _add_segment(self, G, chain):
+    u = chain[0][0]
+    v = chain[-1][1]
+    for n in [u, v]:
+      if n not in G:
+        G.add_node(n, **self._node[n])
+    data = {k:v for k, v in self._succ[u][chain[0][1]][chain[0][2]].items()}
+    data.pop("geometry", None)
+    if all("length" in self._succ[a][b][k] for a, b, k in chain):
+      data["length"] = sum(self._succ[a][b][k]["length"] for a, b, k in chain)
+    # Concatenate the edge geometries, without duplicating shared endpoints.
+    coords = []
+    for a, b, k in chain:
+      try:
+        part = list(self._succ[a][b][k]["geometry"].coords)
+      except KeyError:
+        part = [(self._node[a]["x"], self._node[a]["y"]), (self._node[b]["x"], self._node[b]["y"])]
+      coords.extend(part if not coords else part[1:])
+    data["geometry"] = shapely.LineString(coords)
+    return (u, v, G.add_edge(u, v, **data))
+
+  def _project_from_segments(self, segments, members):
+    skip = ["geometry", "length", "osmid"]
+    for u, v, k, data in segments.edges(keys = True, data = True):
+      values = {x:y for x, y in data.items() if x not in skip}
+      for a, b, c in members[(u, v, k)]:
+        self._succ[a][b][c].update(values)
+
+  def aggregate(self, assessor, zones = None, resolution = None, grid = "hex",
+                quantiles = (0.25, 0.5, 0.75), threshold = 0.5):
+    # Aggregate index and subindex values of edges to zones.
+    # Zones are either given as polygons, or created as a grid of cells.
+    # Edges are split at zone boundaries and weighted by length within a zone.
+    if zones is None:
+      if resolution is None:
+        raise ValueError("Either zones or a grid resolution should be given")
+      zones = self._create_grid(resolution, grid)
+    elif isinstance(zones, gpd.GeoDataFrame):
+      zones = zones.to_crs(self.projected_crs)
+    else:
+      zones = gpd.GeoDataFrame(geometry = gpd.GeoSeries(zones)).to_crs(self.projected_crs)
+    edges = self._get_edge_geometries(projected = True)
+    edge_pos, zone_pos = zones.sindex.query(edges.to_numpy(), predicate = "intersects")
+    pieces = shapely.intersection(
+      edges.to_numpy()[edge_pos],
+      zones.geometry.to_numpy()[zone_pos]
+    )
+    lengths = shapely.length(pieces)
+    # Only index columns that are present in the network are aggregated.
+    names = assessor._find_index_colnames(robustness = True)
+    values = self._get_edge_attributes(*names).apply(pd.to_numeric, errors = "coerce")
+    values = values.dropna(axis = 1, how = "all")
+    out = zones.copy()
+    out["length"] = np.bincount(zone_pos, weights = lengths, minlength = len(zones))
+    for name, column in values.items():
+      stats = self._weighted_stats(
+        column.to_numpy(dtype = float)[edge_pos],
+        lengths,
+        zone_pos,
+        len(zones),
+        quantiles,
+        threshold
+      )
+      for stat, vals in stats.items():
+        out[f"{name}:{stat}"] = vals
+    # Grid cells that do not contain any part of the network are dropped.
+    if resolution is not None:
+      out = out[out["length"] > 0]
+    return out
+
+  def _create_grid(self, resolution, kind = "hex"):
+    xmin, ymin, xmax, ymax = self._get_edge_geometries(projected = True).total_bounds
+    if kind == "square":
+      xs, ys = np.meshgrid(
+        np.arange(xmin, xmax + resolution, resolution),
+        np.arange(ymin, ymax + resolution, resolution)
+      )
+      cells = shapely.box(xs.ravel(), ys.ravel(), xs.ravel() + resolution, ys.ravel() + resolution)
+    elif kind == "hex":
+      # Flat-topped hexagons with sides of the given length.
+      # Every other column is shifted by half a hexagon height.
+      height = np.sqrt(3) * resolution
+      cols = np.arange(xmin, xmax + 1.5 * resolution, 1.5 * resolution)
+      rows = np.arange(ymin - height, ymax + height, height)
+      xs, ys = np.meshgrid(cols, rows)
+      ys = ys + (np.arange(len(cols)) % 2) * height / 2
+      angles = np.arange(6) * np.pi / 3
+      coords = np.stack([
+        xs.reshape(-1, 1) + resolution * np.cos(angles),
+        ys.reshape(-1, 1) + resolution * np.sin(angles)
+      ], axis = -1)
+      cells = shapely.polygons(coords)
+    else:
+      raise ValueError(f"Unsupported grid type: '{kind}'")
+    return gpd.GeoDataFrame(geometry = cells, crs = self.projected_crs)
+
+  @staticmethod
+  def _weighted_stats(values, weights, groups, n, quantiles, threshold):
+    valid = ~np.isnan(values) & (weights > 0)
+    values, weights, groups = values[valid], weights[valid], groups[valid]
+    total = np.bincount(groups, weights = weights, minlength = n)
+    out = {}
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+      out["mean"] = np.bincount(groups, weights = weights * values, minlength = n) / total
+      above = weights * (values >= threshold)
+      out[f"share>={threshold}"] = np.bincount(groups, weights = above, minlength = n) / total
+      # Weighted quantiles of all groups are found with a single sorted search.
+      # Within each group the cumulative weight fraction runs from 0 to 1.
+      # Adding the group number gives a key that increases over all groups.
+      order = np.lexsort((values, groups))
+      values, weights, groups = values[order], weights[order], groups[order]
+      offsets = (np.cumsum(total) - total)[groups]
+      key = groups + (np.cumsum(weights) - offsets) / total[groups]
+      last = np.searchsorted(groups, np.arange(n), side = "right") - 1
+      for q in quantiles:
+        idx = np.searchsorted(key, np.arange(n) + max(q, 1e-12), side = "left")
+        idx = np.clip(np.minimum(idx, last), 0, None)
+        out[f"q{q:g}"] = np.where(total > 0, values[idx] if len(values) else np.nan, np.nan)
+    return out
+
+  def to_csr(self, assessor = None, cost = None, min_index = None):
+    # Edge costs are derived from edge length and index values of the assessor.
+    # The forward index of an edge always describes its own u -> v direction,
+    # also for reversed edges. The backward index belongs to its twin v -> u.
+    # With a minimum index, edges with lower or missing index values are left out.
+    if cost is None:
+      cost = routing.default_cost
+    nodes = list(self.nodes)
+    positions = {n:i for i, n in enumerate(nodes)}
+    edges = list(self.edges(keys = True))
+    n = len(edges)
+    sources = np.fromiter((positions[e[0]] for e in edges), dtype = int, count = n)
+    targets = np.fromiter((positions[e[1]] for e in edges), dtype = int, count = n)
+    data = self._get_edge_attributes("length")
+    lengths = data["length"].to_numpy(dtype = float)
+    if assessor is None:
+      if min_index is not None:
+        raise ValueError("A minimum index requires an assessor")
+      costs = lengths
+    else:
+      name = assessor._construct_index_colname(direction = "forward")
+      index = self._get_edge_attributes(name)[name].to_numpy(dtype = float)
+      costs = cost(lengths, index)
+      if min_index is not None:
+        keep = index >= min_index
+        sources, targets, costs, lengths = sources[keep], targets[keep], costs[keep], lengths[keep]
+        edges = [e for e, k in zip(edges, keep) if k]
+    return routing.CSRGraph.from_arrays(np.array(nodes), sources, targets, costs, edges, lengths)
+
+  def accessibility(self, origins, max_cost, assessor = None, min_index = None,
+                    cost = None, area = True, chunk_size = 50, workers = 1):
+    # Reachability from each origin within a cost budget.
+    # See accessibility.reachability for details on the returned values.
+    graph = self.to_csr(assessor, cost, min_index)
+    if area:
+      points = self._get_node_geometries(projected = True).reindex(graph.nodes)
+      coords = np.column_stack([points.x.to_numpy(), points.y.to_numpy()])
+    else:
+      coords = None
+    return accessibility.reachability(graph, origins, max_cost, coords, chunk_size, workers)
+
+  def _overlay(self):
+    # Create a copy-on-write copy of the network.
+    # The adjacency structure is rebuilt, but node and edge attribute dicts are
+    # wrapped in overlays that share all existing values with this network.
+    # In compact mode the edges of the copy are views into an overlay of the
+    # edge store instead, which shares values per column rather than per edge.
+    # Layers, geometries and other metadata are shared by reference as well.
+    new = self.__class__.__new__(self.__class__)
+    new.__dict__.update(self.__dict__)
+    for k in list(new.__dict__):
+      if isinstance(getattr(self.__class__, k, None), cached_property):
+        del new.__dict__[k]
+    if "__networkx_cache__" in new.__dict__:
+      new.__networkx_cache__ = {}
+    if self._edge_store is None:
+      wrap = AttributeOverlay
+    else:
+      new._edge_store = self._edge_store.overlay()
+      new.edge_attr_dict_factory = new._edge_store.new_view
+      def wrap(d):
+        if isinstance(d, EdgeAttributeView):
+          return EdgeAttributeView(new._edge_store, d._idx)
+        return AttributeOverlay(d)
+    new._geometry_cache = dict(self._geometry_cache)
+    new.graph = AttributeOverlay(self.graph)
+    new._node = {n:AttributeOverlay(d) for n, d in self._node.items()}
+    new._succ = {n:{} for n in self._node}
+    new._pred = {n:{} for n in self._node}
+    for u, nbrs in self._succ.items():
+      for v, keydict in nbrs.items():
+        overlays = {k:wrap(d) for k, d in keydict.items()}
+        new._succ[u][v] = overlays
+        new._pred[v][u] = overlays
+    new._adj = new._succ
+    return new
+
+  def _get_edge_attributes(self, *attrs, positions = None):
     if self.is_multigraph():
       E = self.edges(keys = True, data = True)
     else:
       E = self.edges(data = True)
+    # Optionally only include the edges at the given positions.
+    if positions is not None:
+      E = list(E)
+      E = [E[i] for i in positions]
     # Subset edge data to contain only the specified attributes.
     E = [[e[:-1], {k:e[-1][k] for k in set(attrs) & set(e[-1].keys())}] for e in E]
     keys, data = zip(*E)
@@ -243,10 +865,16 @@ class NetascoreNetwork(Network):
     return out.reindex(columns = attrs)
 
   def _get_edge_geometries(self, projected = False):
-    geoms = ox.graph_to_gdfs(self, nodes = False, edges = True)["geometry"]
-    if projected:
-      geoms = geoms.to_crs(self.projected_crs)
-    return geoms
+    return self._get_cached_geometries("edges", projected)
+
+  def _get_edge_frame(self, *attrs):
+    # Edge attributes together with edge geometries, indexed by edge key.
+    # Attributes that are not present at any edge are left out.
+    geoms = self._get_edge_geometries()
+    data = self._get_edge_attributes(*attrs)
+    data.index = pd.MultiIndex.from_tuples(data.index, names = geoms.index.names)
+    data = data.dropna(axis = 1, how = "all")
+    return gpd.GeoDataFrame(data, geometry = geoms.reindex(data.index))
 
   def _get_node_attributes(self, *attrs):
     N = self.nodes(data = True)
@@ -257,13 +885,125 @@ class NetascoreNetwork(Network):
     return out.reindex(columns = attrs)
 
   def _get_node_geometries(self, projected = False):
-    geoms = ox.graph_to_gdfs(self, nodes = True, edges = False)["geometry"]
+    return self._get_cached_geometries("nodes", projected)
+
+  def _get_undirected_geometries(self, projected = False):
+    # Geometries of one edge of each pair of reverse twins.
+    _, firsts = self._get_twin_index()
+    return self._get_edge_geometries(projected).iloc[firsts]
+
+  def _get_undirected_attributes(self, *attrs):
+    # Attributes of one edge of each pair of reverse twins.
+    _, firsts = self._get_twin_index()
+    return self._get_edge_attributes(*attrs, positions = firsts)
+
+  def _spread_undirected(self, values):
+    # Assign values of undirected edges to both twins of each pair.
+    # Values are ordered like the undirected geometries and attributes.
+    groups, _ = self._get_twin_index()
+    edges = self.edges(keys = True)
+    return {e:values[i] for e, i in zip(edges, groups.tolist())}
+
+  def _get_twin_index(self):
+    return self._get_cached(("twins", None), self._build_twin_index)
+
+  def _build_twin_index(self):
+    # Two-way streets are stored as two edges in opposite directions.
+    # These reverse twins belong to the same OSM way, connect the same nodes
+    # and have identical geometries, such that undirected attributes of them
+    # are equal and only need to be derived once. Returns the index of the
+    # pair of each edge, and the position of the first edge of each pair.
+    groups = []
+    firsts = []
+    unmatched = {}
+    for i, (u, v, d) in enumerate(self.edges(data = True)):
+      osmid = repr(d.get("osmid"))
+      geom = d.get("geometry")
+      coords = None if geom is None else list(geom.coords)
+      candidates = unmatched.get((v, u, osmid), [])
+      for j, (group, other) in enumerate(candidates):
+        if other == (None if coords is None else coords[::-1]):
+          groups.append(group)
+          del candidates[j]
+          break
+      else:
+        groups.append(len(firsts))
+        unmatched.setdefault((u, v, osmid), []).append((len(firsts), coords))
+        firsts.append(i)
+    return np.array(groups, dtype = int), np.array(firsts, dtype = int)
+
+  def _get_cached_geometries(self, kind, projected = False):
+    key = (kind, self.projected_crs if projected else None)
     if projected:
-      geoms = geoms.to_crs(self.projected_crs)
-    return geoms
+      build = lambda: self._get_cached_geometries(kind).to_crs(self.projected_crs)
+    else:
+      build = getattr(self, f"_build_{kind[:-1]}_geometries")
+    return self._get_cached(key, build)
 
-  def _get_layer_attributes(self, *attrs):
-    return getattr(self, layer)[attrs]
+  def _get_cached(self, key, build):
+    # Cached geometries and edge indices are invalidated whenever nodes or
+    # edges are added or removed.
+    signature = (self.number_of_nodes(), self.number_of_edges())
+    if self._geometry_signature != signature:
+      self._geometry_cache = {}
+      self._geometry_signature = signature
+    try:
+      return self._geometry_cache[key]
+    except KeyError:
+      pass
+    value = build()
+    self._geometry_cache[key] = value
+    return value
+
+  def _get_cached_for_layer(self, key, obj, build):
+    # Values derived from a layer are cached together with the layer object.
+    # Holding a reference to it prevents its id from being reused, and entries
+    # of a replaced layer are rebuilt instead of returned.
+    source, value = self._get_cached(key, lambda: (obj, build()))
+    if source is not obj:
+      value = build()
+      self._geometry_cache[key] = (obj, value)
+    return value
+
+  def _build_node_geometries(self):
+    # Build points directly from node coordinates.
+    # This avoids constructing a full node GeoDataFrame with ox.graph_to_gdfs.
+    keys = []
+    xs = []
+    ys = []
+    for n, d in self.nodes(data = True):
+      keys.append(n)
+      xs.append(d["x"])
+      ys.append(d["y"])
+    geoms = gpd.points_from_xy(xs, ys, crs = self.graph["crs"])
+    return gpd.GeoSeries(geoms, index = pd.Index(keys, name = "osmid"), name = "geometry")
+
+  def _build_edge_geometries(self):
+    # Use the edge geometry where present, and a straight line between the
+    # coordinates of its endpoints otherwise (like ox.graph_to_gdfs does).
+    coords = {n:(d["x"], d["y"]) for n, d in self.nodes(data = True)}
+    keys = []
+    geoms = []
+    for u, v, k, d in self.edges(keys = True, data = True):
+      keys.append((u, v, k))
+      try:
+        geoms.append(d["geometry"])
+      except KeyError:
+        geoms.append(shapely.LineString([coords[u], coords[v]]))
+    index = pd.MultiIndex.from_tuples(keys, names = ["u", "v", "key"])
+    return gpd.GeoSeries(geoms, index = index, crs = self.graph["crs"], name = "geometry")
+
+  def _get_layer_attributes(self, layer, *attrs):
+    return getattr(self, layer)[list(attrs)]
+
+  def _get_projected_layer(self, layer):
+    # Vector layers in the projected CRS, cached per layer object.
+    # Raster layers are returned as they are.
+    obj = getattr(self, layer)
+    if isinstance(obj, RasterLayer):
+      return obj
+    key = ("projected", layer)
+    return self._get_cached_for_layer(key, obj, lambda: obj.to_crs(self.projected_crs))
 
   def _get_layer_geometries(self, layer, projected = False):
     geoms = getattr(self, layer)["geometry"]
@@ -271,11 +1011,266 @@ class NetascoreNetwork(Network):
       geoms = geoms.to_crs(self.projected_crs)
     return geoms
 
+  def _get_prepared_geometries(self, layer, buffer, tolerance = None):
+    # Projected polygons of a layer, prepared for computing their coverage of
+    # edge buffers. Prepared layers are cached per layer object, such that
+    # replaced layers are prepared again.
+    key = ("prepared", layer, buffer, tolerance)
+    build = lambda: self._build_prepared_geometries(layer, buffer, tolerance)
+    return self._get_cached_for_layer(key, getattr(self, layer), build)
+
+  def _build_prepared_geometries(self, layer, buffer, tolerance = None):
+    # Polygons are clipped to the extent of the edges buffered by the given
+    # distance, and overlapping polygons (like building parts, or parks with
+    # grass and meadows inside) are dissolved, such that no area is covered
+    # twice. The dissolved coverage is split into its parts again, for the
+    # spatial index to keep filtering candidates efficiently. With a tolerance
+    # in meters, polygons are simplified as well.
+    geoms = self._get_layer_geometries(layer, projected = True)
+    geoms = geoms[geoms.geom_type.isin(["Polygon", "MultiPolygon"])].values
+    edges = self._get_undirected_geometries(projected = True)
+    if len(edges):
+      xmin, ymin, xmax, ymax = edges.total_bounds
+      geoms = shapely.clip_by_rect(geoms, xmin - buffer, ymin - buffer,
+                                   xmax + buffer, ymax + buffer)
+    parts = shapely.get_parts(shapely.union_all(shapely.make_valid(geoms)))
+    parts = parts[shapely.get_type_id(parts) == 3]
+    if tolerance is not None:
+      parts = shapely.simplify(parts, tolerance, preserve_topology = True)
+    return gpd.GeoSeries(parts[~shapely.is_empty(parts)], crs = self.projected_crs)
+
+  def _get_extent(self, buffer = 0):
+    xmin, ymin, xmax, ymax = self._get_node_geometries(projected = True).total_bounds
+    extent = shapely.box(xmin - buffer, ymin - buffer, xmax + buffer, ymax + buffer)
+    return gpd.GeoSeries([extent], crs = self.projected_crs)
+
+  def _read_parquet_layer(self, filepath, columns = None, extent = None, **kwargs):
+    import pyarrow.parquet as pq
+    # Parquet files are memory-mapped instead of read into a buffer first.
+    kwargs.setdefault("memory_map", True)
+    meta = json.loads(pq.read_schema(filepath).metadata[b"geo"])
+    primary = meta["primary_column"]
+    if columns is not None:
+      columns = [x for x in columns if x != primary] + [primary]
+    # Without a CRS in the metadata the data is in OGC:CRS84 by definition.
+    # With an explicitly unknown CRS the extent can not be used for filtering.
+    crs = meta["columns"][primary].get("crs", "OGC:CRS84")
+    if extent is None or crs is None:
+      return gpd.read_parquet(filepath, columns = columns, **kwargs)
+    bounds = tuple(extent.to_crs(crs).total_bounds)
+    # The bbox filter can be pushed down only if the file has a bbox covering.
+    if "covering" in meta["columns"][primary]:
+      return gpd.read_parquet(filepath, columns = columns, bbox = bounds, **kwargs)
+    layer = gpd.read_parquet(filepath, columns = columns, **kwargs)
+    matches = layer.sindex.query(shapely.box(*bounds), predicate = "intersects")
+    return layer.iloc[sorted(matches)]
+
+  @staticmethod
+  def _uses_pyogrio(engine = None):
+    if engine is None:
+      engine = gpd.options.io_engine
+    if engine is None:
+      engine = "pyogrio" if int(gpd.__version__.split(".")[0]) >= 1 else "fiona"
+    return engine == "pyogrio"
+
+  def _is_raster_layer(self, name):
+    return isinstance(getattr(self, name), RasterLayer)
+
+  def _sample_raster_along_edges(self, layer, spacing = 5):
+    # Sample the raster at the midpoints of equally long pieces of each edge.
+    # The mean of these samples is a length-weighted mean of the raster values.
+    # Reverse twins have the same samples, so only one of them is sampled.
+    edges = self._get_undirected_geometries(projected = True)
+    lengths = edges.length.to_numpy()
+    counts = np.maximum(np.ceil(lengths / spacing), 1).astype(int)
+    ids = np.repeat(np.arange(len(edges)), counts)
+    offsets = np.arange(len(ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+    distances = (offsets + 0.5) * (lengths / counts)[ids]
+    lines = gpd.GeoSeries(edges.to_numpy()[ids], crs = edges.crs)
+    points = lines.interpolate(distances)
+    values = self._read_raster_at(layer, points)
+    # Aggregate the sampled values per edge, ignoring samples without data.
+    valid = ~np.isnan(values)
+    sums = np.bincount(ids[valid], weights = values[valid], minlength = len(edges))
+    sizes = np.bincount(ids[valid], minlength = len(edges))
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+      means = np.where(sizes > 0, sums / sizes, np.nan)
+    groups, _ = self._get_twin_index()
+    return pd.Series(means[groups], index = self._get_edge_geometries().index)
+
+  def _sample_raster_around_edges(self, layer, distance):
+    # Take the mean of all raster cells whose center lies within the edge buffer.
+    import rasterio
+    from rasterio.windows import transform as window_transform
+    edges = self._get_undirected_geometries(projected = True)
+    buffers = edges.buffer(distance = distance, cap_style = 2)
+    raster = getattr(self, layer)
+    with rasterio.open(raster.filepath) as src:
+      buffers = buffers.to_crs(src.crs)
+      data, window = self._read_raster_window(src, raster.band, buffers.total_bounds)
+      base = window_transform(window, src.transform)
+    sums = np.zeros(len(buffers))
+    counts = np.zeros(len(buffers))
+    for idx, rows, cols in self._find_cells_in_buffers(buffers.values, base, data.shape):
+      values = data[rows, cols]
+      valid = ~np.isnan(values)
+      sums += np.bincount(idx[valid], weights = values[valid], minlength = len(buffers))
+      counts += np.bincount(idx[valid], minlength = len(buffers))
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+      means = np.where(counts > 0, sums / counts, np.nan)
+    groups, _ = self._get_twin_index()
+    return pd.Series(means[groups], index = self._get_edge_geometries().index)
+
+  @staticmethod
+  def _find_cells_in_buffers(buffers, transform, shape, batch_size = 2 ** 22):
+    # Find the cells of a north-up grid whose center lies within each buffer.
+    # Yields batches of buffer positions with the rows and columns of their cells.
+    # Instead of masking one buffer at a time, the cells in the windows around
+    # all buffers of a batch are tested at once. Buffers overlap (e.g. at
+    # junctions), such that a cell may belong to several of them.
+    buffers = np.asarray(buffers)
+    shapely.prepare(buffers)
+    minx, miny, maxx, maxy = shapely.bounds(buffers).T
+    height, width = shape
+    col_start = np.clip(np.floor((minx - transform.c) / transform.a), 0, width).astype(np.int64)
+    col_stop = np.clip(np.floor((maxx - transform.c) / transform.a) + 1, 0, width).astype(np.int64)
+    row_start = np.clip(np.floor((maxy - transform.f) / transform.e), 0, height).astype(np.int64)
+    row_stop = np.clip(np.floor((miny - transform.f) / transform.e) + 1, 0, height).astype(np.int64)
+    widths = np.maximum(col_stop - col_start, 0)
+    sizes = widths * np.maximum(row_stop - row_start, 0)
+    # Batches hold buffers with about batch_size candidate cells in total.
+    positions = np.flatnonzero(sizes)
+    ends = np.cumsum(sizes[positions])
+    splits = []
+    if len(ends):
+      splits = np.unique(np.searchsorted(ends, np.arange(batch_size, ends[-1], batch_size)))
+    for batch in np.split(positions, splits):
+      if not len(batch):
+        continue
+      idx = np.repeat(batch, sizes[batch])
+      starts = np.repeat(np.cumsum(sizes[batch]) - sizes[batch], sizes[batch])
+      offsets = np.arange(len(idx)) - starts
+      rows = row_start[idx] + offsets // widths[idx]
+      cols = col_start[idx] + offsets % widths[idx]
+      xs = transform.c + (cols + 0.5) * transform.a
+      ys = transform.f + (rows + 0.5) * transform.e
+      inside = shapely.contains_xy(buffers[idx], xs, ys)
+      yield idx[inside], rows[inside], cols[inside]
+
+  def _intersect_coverage_around_edges(self, layer, distance, tolerance = None):
+    # Percentage of each edge buffer covered by the polygons of a layer.
+    # Only pairs of buffers and polygons whose bounding boxes intersect are
+    # intersected, all at once, and the areas are summed per buffer.
+    edges = self._get_undirected_geometries(projected = True)
+    polys = self._get_prepared_geometries(layer, distance, tolerance)
+    buffers = edges.buffer(distance = distance, cap_style = 2).values
+    i, j = polys.sindex.query(buffers)
+    areas = shapely.area(shapely.intersection(buffers[i], polys.values[j]))
+    covered = np.bincount(i, weights = areas, minlength = len(buffers))
+    shares = covered / shapely.area(buffers) * 100
+    groups, _ = self._get_twin_index()
+    return pd.Series(shares[groups], index = self._get_edge_geometries().index)
+
+  def _compute_coverage_around_edges(self, layer, distance, resolution = 2):
+    # Approximate the percentage of each edge buffer covered by the polygons of
+    # a layer, by counting cells of a coverage grid instead of intersecting the
+    # buffer with the polygons. Cells count as part of the buffer or a polygon
+    # if their center lies within it, such that misclassified cells are within
+    # half a cell diagonal of a boundary. The error of the covered area is hence
+    # at most resolution * sqrt(2) times the length of the buffer and polygon
+    # boundaries within the buffer, and errors on opposite sides largely cancel.
+    edges = self._get_undirected_geometries(projected = True)
+    grid, table, transform = self._get_coverage_grid(layer, resolution, distance)
+    buffers = edges.buffer(distance = distance, cap_style = 2)
+    # Windows of cells around each buffer, clipped to the grid.
+    minx, miny, maxx, maxy = buffers.bounds.to_numpy().T
+    col_start = np.clip(np.floor((minx - transform.c) / resolution), 0, grid.shape[1]).astype(int)
+    col_stop = np.clip(np.floor((maxx - transform.c) / resolution) + 1, 0, grid.shape[1]).astype(int)
+    row_start = np.clip(np.floor((transform.f - maxy) / resolution), 0, grid.shape[0]).astype(int)
+    row_stop = np.clip(np.floor((transform.f - miny) / resolution) + 1, 0, grid.shape[0]).astype(int)
+    # The summed-area table gives the number of covered cells in each window.
+    # Windows without any or with only covered cells need no buffer mask.
+    sums = table[row_stop, col_stop] - table[row_start, col_stop] \
+      - table[row_stop, col_start] + table[row_start, col_start]
+    sizes = (row_stop - row_start) * (col_stop - col_start)
+    shares = np.where((sums == sizes) & (sizes > 0), 100.0, 0.0)
+    partial = np.flatnonzero((sums > 0) & (sums < sizes))
+    counts = np.zeros(len(partial))
+    covered = np.zeros(len(partial))
+    for idx, rows, cols in self._find_cells_in_buffers(buffers.values[partial], transform, grid.shape):
+      counts += np.bincount(idx, minlength = len(partial))
+      covered += np.bincount(idx, weights = grid[rows, cols], minlength = len(partial))
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+      shares[partial] = np.where(counts > 0, covered / counts * 100, 0.0)
+    groups, _ = self._get_twin_index()
+    return pd.Series(shares[groups], index = self._get_edge_geometries().index)
+
+  def _get_coverage_grid(self, layer, resolution, distance):
+    # Grids are cached per layer object, such that replaced layers are rasterized again.
+    key = ("coverage", layer, resolution, distance)
+    build = lambda: self._build_coverage_grid(layer, resolution, distance)
+    return self._get_cached_for_layer(key, getattr(self, layer), build)
+
+  def _build_coverage_grid(self, layer, resolution, distance):
+    # Rasterize the polygons of a layer once to a grid of square cells that
+    # covers all edge buffers. Returns the grid with a value of 1 for covered
+    # cells, its summed-area table and the transform of the grid.
+    from rasterio.features import rasterize
+    from rasterio.transform import from_origin
+    edges = self._get_undirected_geometries(projected = True)
+    margin = distance + resolution
+    xmin, ymin, xmax, ymax = edges.total_bounds if len(edges) else (0, 0, 0, 0)
+    transform = from_origin(xmin - margin, ymax + margin, resolution, resolution)
+    width = int(np.ceil((xmax - xmin + 2 * margin) / resolution))
+    height = int(np.ceil((ymax - ymin + 2 * margin) / resolution))
+    polys = self._get_layer_geometries(layer, projected = True)
+    polys = polys[polys.geom_type.isin(["Polygon", "MultiPolygon"]) & ~polys.is_empty]
+    if len(polys):
+      grid = rasterize(polys.values, out_shape = (height, width), transform = transform,
+                       fill = 0, default_value = 1, dtype = "uint8")
+    else:
+      grid = np.zeros((height, width), dtype = "uint8")
+    dtype = np.int32 if grid.size < 2 ** 31 else np.int64
+    table = np.zeros((height + 1, width + 1), dtype = dtype)
+    np.cumsum(np.cumsum(grid, axis = 0, dtype = dtype), axis = 1, out = table[1:, 1:])
+    return grid, table, transform
+
+  def _read_raster_at(self, layer, points):
+    import rasterio
+    from rasterio.transform import rowcol
+    raster = getattr(self, layer)
+    with rasterio.open(raster.filepath) as src:
+      points = points.to_crs(src.crs)
+      data, window = self._read_raster_window(src, raster.band, points.total_bounds)
+      rows, cols = rowcol(src.transform, points.x.to_numpy(), points.y.to_numpy())
+    rows = np.asarray(rows) - window.row_off
+    cols = np.asarray(cols) - window.col_off
+    inside = (rows >= 0) & (rows < data.shape[0]) & (cols >= 0) & (cols < data.shape[1])
+    values = np.full(len(rows), np.nan)
+    values[inside] = data[rows[inside], cols[inside]]
+    return values
+
+  @staticmethod
+  def _read_raster_window(src, band, bounds):
+    # Read only the part of the raster that covers the given bounds.
+    # Cells without data are returned as NaN.
+    from rasterio.transform import rowcol
+    from rasterio.windows import Window
+    minx, miny, maxx, maxy = bounds
+    rows, cols = rowcol(src.transform, [minx, maxx], [maxy, miny])
+    row_start, row_stop = max(min(rows), 0), min(max(rows) + 1, src.height)
+    col_start, col_stop = max(min(cols), 0), min(max(cols) + 1, src.width)
+    if row_start >= row_stop or col_start >= col_stop:
+      return np.full((0, 0), np.nan), Window(0, 0, 0, 0)
+    window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    data = src.read(band, window = window, masked = True).astype(float)
+    return data.filled(np.nan), window
+
   def _check_layer_presence(self, name, fetch = False):
-    if getattr(self, name) is None:
+    if getattr(self, name, None) is None:
       if fetch:
         try:
-          getattr(self, f"fetch_{layer}")()
+          getattr(self, f"fetch_{name}")()
         except AttributeError:
           pass
         self._check_layer_presence(name, fetch = False)
@@ -1,5 +1,4 @@
 import copy
-import yaml
 
 from abc import abstractmethod
 from collections import OrderedDict
@@ -8,6 +7,9 @@ from collections.abc import MutableMapping
 from netapy import utils
 from netapy.exceptions import NetapyProfileError
 
+pd = utils.lazy_import("pandas")
+yaml = utils.lazy_import("yaml")
+
 
 class Profile(dict):
 
@@ -93,13 +95,42 @@ class NetascoreProfile(Profile):
     out = dict(self)
     # Parse weights.
     out["weights"] = {k:v for k, v in out["weights"].items() if v is not None}
-    # TODO: Parse overrides.
     # Parse indicator mappings.
     raw = out["indicator_mapping"]
     parsed = {i["indicator"]:self.parse_indicator_mapping(i) for i in raw}
     out["indicator_mapping"] = parsed
+    # Parse overrides.
+    raw = out.get("overrides") or []
+    out["overrides"] = [self.parse_override(i) for i in raw]
+    for override in out["overrides"]:
+      for label in override["for"]:
+        if label not in out["indicator_mapping"]:
+          raise NetapyProfileError(
+            f"Override adjusts the weight of indicator '{label}' which has no mapping"
+          )
     self._parsed = out
 
+  @staticmethod
+  def parse_override(obj):
+    raw = copy.deepcopy(obj)
+    raw.pop("description", None)
+    # Parse output.
+    output = raw.pop("output", None) or {}
+    outtype = output.get("type")
+    if outtype == "weight":
+      targets = output.get("for", [])
+      targets = [targets] if isinstance(targets, str) else list(targets)
+    elif outtype == "index":
+      targets = []
+    else:
+      raise NetapyProfileError(
+        f"Unsupported override type for indicator '{raw.get('indicator')}': {outtype}"
+      )
+    # Parse mapping object.
+    # Its rules work like indicator mappings, but are matched against attribute values.
+    mapping = NetascoreProfile.parse_indicator_mapping(raw)
+    return {"type": outtype, "for": targets, "mapping": mapping}
+
   @staticmethod
   def parse_indicator_mapping(obj):
     raw = copy.deepcopy(obj)
@@ -0,0 +1,100 @@
+from netapy import utils
+
+np = utils.lazy_import("numpy")
+
+
+def default_cost(length, index):
+  # Edges with the best index value cost their length.
+  # Edges with the worst index value, or without an index value, cost twice that.
+  index = np.where(np.isnan(index), 0, np.clip(index, 0, 1))
+  return length * (2 - index)
+
+
+class CSRGraph():
+
+  # Compressed sparse row adjacency of a directed network.
+  # Outgoing edges of the node at position i are stored at positions
+  # indptr[i]:indptr[i + 1] of the indices, costs and edge ids arrays.
+  # Edge ids are positions in the list of edge keys.
+  # Edge lengths, if given, are aligned with the list of edge keys.
+  def __init__(self, nodes, indptr, indices, costs, edge_ids, edges, lengths = None):
+    self.nodes = nodes
+    self.indptr = indptr
+    self.indices = indices
+    self.costs = costs
+    self.edge_ids = edge_ids
+    self.edges = edges
+    self.lengths = lengths
+    self._positions = {n:i for i, n in enumerate(nodes)}
+    self._matrix = None
+
+  @classmethod
+  def from_arrays(cls, nodes, sources, targets, costs, edges, lengths = None):
+    # Sources and targets are node positions, one per edge.
+    order = np.argsort(sources, kind = "stable")
+    counts = np.bincount(sources, minlength = len(nodes))
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    return cls(nodes, indptr, targets[order], costs[order], order, edges, lengths)
+
+  @property
+  def matrix(self):
+    # Sparse cost matrix with only the cheapest of any parallel edges.
+    if self._matrix is None:
+      from scipy.sparse import csr_matrix
+      sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+      cheapest = self._cheapest_edges(sources, self.indices, self.costs)
+      n = len(self.nodes)
+      self._matrix = csr_matrix(
+        (self.costs[cheapest], (sources[cheapest], self.indices[cheapest])),
+        shape = (n, n)
+      )
+    return self._matrix
+
+  def shortest_path_lengths(self, sources, targets = None, chunk_size = 100):
+    # Returns a matrix with one row per source and one column per target.
+    # Sources are processed in chunks to bound memory usage.
+    from scipy.sparse.csgraph import dijkstra
+    sources = self._get_positions(sources)
+    targets = None if targets is None else self._get_positions(targets)
+    n_targets = len(self.nodes) if targets is None else len(targets)
+    out = np.empty((len(sources), n_targets))
+    for start in range(0, len(sources), chunk_size):
+      chunk = sources[start:(start + chunk_size)]
+      dists = dijkstra(self.matrix, directed = True, indices = chunk)
+      out[start:(start + len(chunk))] = dists if targets is None else dists[:, targets]
+    return out
+
+  def shortest_path(self, source, target):
+    # Returns the keys of the edges on the shortest path, or None if unreachable.
+    from scipy.sparse.csgraph import dijkstra
+    s, t = self._get_positions([source, target])
+    _, predecessors = dijkstra(
+      self.matrix,
+      directed = True,
+      indices = s,
+      return_predecessors = True
+    )
+    if s != t and predecessors[t] < 0:
+      return None
+    path = []
+    while t != s:
+      u = predecessors[t]
+      path.append(self.edges[self._cheapest_edge(u, t)])
+      t = u
+    return path[::-1]
+
+  def _cheapest_edge(self, u, v):
+    start, end = self.indptr[u], self.indptr[u + 1]
+    candidates = np.flatnonzero(self.indices[start:end] == v) + start
+    return self.edge_ids[candidates[np.argmin(self.costs[candidates])]]
+
+  def _get_positions(self, nodes):
+    return np.array([self._positions[n] for n in nodes], dtype = int)
+
+  @staticmethod
+  def _cheapest_edges(sources, targets, costs):
+    order = np.lexsort((costs, targets, sources))
+    pairs = np.stack([sources[order], targets[order]], axis = 1)
+    first = np.ones(len(order), dtype = bool)
+    first[1:] = np.any(pairs[1:] != pairs[:-1], axis = 1)
+    return order[first]
@@ -0,0 +1,383 @@
+import argparse
+import functools
+import json
+import logging
+import threading
+import time
+
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from netapy import __version__, defaults, utils
+from netapy.exceptions import NetapyNetworkError, NetapyProfileError
+
+logger = logging.getLogger(__name__)
+
+# Layers that are prepared once per network instead of once per request.
+_LAYERS = ["buildings", "crossings", "facilities", "greenness", "water", "noise"]
+
+class LRUCache():
+
+  # Thread-safe mapping that holds at most maxsize entries.
+  # When full, the least recently used entry is evicted.
+  def __init__(self, maxsize = 8):
+    self.maxsize = maxsize
+    self._data = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._data)
+
+  def __contains__(self, key):
+    return key in self._data
+
+  def get(self, key, default = None):
+    with self._lock:
+      try:
+        self._data.move_to_end(key)
+      except KeyError:
+        return default
+      return self._data[key]
+
+  def put(self, key, value):
+    with self._lock:
+      self._data[key] = value
+      self._data.move_to_end(key)
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last = False)
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+
+
+class ExtractLoader():
+
+  # Loads areas from a local OSM XML extract instead of querying OSM.
+  # The extract is read once and each area is cut out of it.
+  def __init__(self, filepath, **kwargs):
+    self.filepath = filepath
+    self.kwargs = kwargs
+    self._network = None
+    self._lock = threading.Lock()
+
+  @property
+  def network(self):
+    with self._lock:
+      if self._network is None:
+        from netapy.networks import NetascoreNetwork
+        self._network = NetascoreNetwork.from_file(self.filepath, **self.kwargs)
+    return self._network
+
+  def __call__(self, area):
+    if "place" in area:
+      raise ValueError("Place queries are not supported when serving from an extract")
+    geoms = self.network._get_edge_geometries()
+    matches = geoms.sindex.query(_get_area_geometry(area), predicate = "intersects")
+    return self.network._get_subnetwork(geoms.index[matches])
+
+
+class ScoringService():
+
+  # Scores areas with one or more profiles while keeping the expensive parts warm:
+  # parsed profiles, recently loaded networks with their layers and geometries,
+  # and recently computed scores. Concurrent requests for the same network or
+  # score are coalesced, such that the work is done only once.
+  def __init__(self, profiles = None, loader = None, layers = None,
+               max_networks = 8, max_results = 64, attribute_store = None,
+               compact = False):
+    if profiles is None:
+      profiles = list(defaults.NETASCORE_PROFILES)
+    self.profiles = {}
+    for profile in profiles:
+      if isinstance(profile, str):
+        profile = defaults.NETASCORE_PROFILES[profile]
+      if profile.name is None:
+        raise NetapyProfileError("Served profiles need to have a name")
+      # Profiles are parsed once up front instead of on the first request.
+      profile.parsed
+      self.profiles[profile.name] = profile
+    if loader is None:
+      loader = functools.partial(_load_from_osm, compact = compact)
+    self.loader = loader
+    self.layers = {} if layers is None else layers
+    # A store given as file path is opened once and shared by all requests.
+    # Each thread uses its own connection to it.
+    self._owns_store = isinstance(attribute_store, str)
+    if self._owns_store:
+      from netapy.stores import AttributeStore
+      attribute_store = AttributeStore(attribute_store)
+    self.attribute_store = attribute_store
+    self._networks = LRUCache(max_networks)
+    self._results = LRUCache(max_results)
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._counts = {
+      "requests": 0,
+      "errors": 0,
+      "coalesced": 0,
+      "network_hits": 0,
+      "network_misses": 0,
+      "result_hits": 0,
+      "result_misses": 0
+    }
+    self._latencies = deque(maxlen = 1000)
+    # Requests are handled in parallel threads.
+    from netapy import assessors, networks
+    utils.load_lazy_modules()
+
+  def score(self, area, profile = "bike"):
+    # Returns a GeoDataFrame with the index values of each edge in the area.
+    start = time.perf_counter()
+    self._count("requests")
+    try:
+      if profile not in self.profiles:
+        raise ValueError(f"Unknown profile: '{profile}'")
+      key = (_get_area_key(area), profile)
+      out = self._results.get(key)
+      if out is None:
+        self._count("result_misses")
+        out = self._coalesce(("result", key), lambda: self._compute(area, key))
+      else:
+        self._count("result_hits")
+    except Exception:
+      self._count("errors")
+      raise
+    finally:
+      with self._lock:
+        self._latencies.append(time.perf_counter() - start)
+    return out
+
+  def metrics(self):
+    with self._lock:
+      counts = dict(self._counts)
+      latencies = sorted(self._latencies)
+    out = {"counts": counts}
+    for kind in ["network", "result"]:
+      lookups = counts[f"{kind}_hits"] + counts[f"{kind}_misses"]
+      out[f"{kind}_hit_rate"] = counts[f"{kind}_hits"] / lookups if lookups else None
+    out["cached_networks"] = len(self._networks)
+    out["cached_results"] = len(self._results)
+    if latencies:
+      n = len(latencies)
+      out["latency"] = {
+        "count": n,
+        "mean": sum(latencies) / n,
+        "p50": latencies[int(0.5 * (n - 1))],
+        "p95": latencies[int(0.95 * (n - 1))],
+        "max": latencies[-1]
+      }
+    else:
+      out["latency"] = None
+    return out
+
+  def clear(self):
+    self._networks.clear()
+    self._results.clear()
+
+  def close(self):
+    # Stores given as instance are left open for the caller.
+    if self._owns_store:
+      self.attribute_store.close()
+
+  def _compute(self, area, key):
+    # Another request may have finished the same work in the meantime.
+    out = self._results.get(key)
+    if out is not None:
+      return out
+    from netapy.assessors import NetascoreAssessor
+    network = self._get_network(area, key[0])
+    profile = self.profiles[key[1]]
+    assessor = NetascoreAssessor(profile, attribute_store = self.attribute_store)
+    # Requests are assessed on a copy-on-write copy of the cached network.
+    # This keeps the cached network unchanged while it is shared between threads.
+    assessed = network.assess(assessor, inplace = False)
+    out = assessed._get_edge_frame("osmid", *assessor._find_index_colnames())
+    self._results.put(key, out)
+    return out
+
+  def _get_network(self, area, area_key):
+    network = self._networks.get(area_key)
+    if network is None:
+      self._count("network_misses")
+      network = self._coalesce(("network", area_key), lambda: self._load(area, area_key))
+    else:
+      self._count("network_hits")
+    return network
+
+  def _load(self, area, area_key):
+    network = self._networks.get(area_key)
+    if network is not None:
+      return network
+    network = self.loader(area)
+    logger.info(f"Loaded network with {network.number_of_edges()} edges")
+    for name, filepath in self.layers.items():
+      network.add_layer_from_file(name, filepath)
+    # Prepare everything that would otherwise be redone by every request.
+    labels = set()
+    for profile in self.profiles.values():
+      labels.update(profile.parsed["weights"])
+    for name in [x for x in _LAYERS if x in labels]:
+      try:
+        network._check_layer_presence(name, fetch = True)
+      except NetapyNetworkError:
+        logger.warning(f"Network layer '{name}' is not available")
+    network._get_edge_geometries(projected = True)
+    self._networks.put(area_key, network)
+    return network
+
+  def _coalesce(self, key, func):
+    # Only the first of concurrent calls with the same key runs func.
+    # The others wait for its result.
+    with self._lock:
+      future = self._pending.get(key)
+      owner = future is None
+      if owner:
+        future = Future()
+        self._pending[key] = future
+      else:
+        self._counts["coalesced"] += 1
+    if owner:
+      try:
+        future.set_result(func())
+      except BaseException as e:
+        future.set_exception(e)
+      finally:
+        with self._lock:
+          del self._pending[key]
+    return future.result()
+
+  def _count(self, name):
+    with self._lock:
+      self._counts[name] += 1
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+
+  # POST /score with a JSON body like {"profile": "bike", "bbox": [w, s, e, n]}.
+  # Instead of a bbox the area can be given as a "place" name or a GeoJSON "polygon".
+  # GET /metrics returns latencies and cache hit rates, GET /health returns ok.
+  server_version = f"netapy/{__version__}"
+
+  def do_GET(self):
+    if self.path == "/health":
+      self._send_json(200, {"status": "ok"})
+    elif self.path == "/metrics":
+      self._send_json(200, self.server.service.metrics())
+    else:
+      self._send_json(404, {"error": f"Not found: '{self.path}'"})
+
+  def do_POST(self):
+    if self.path != "/score":
+      self._send_json(404, {"error": f"Not found: '{self.path}'"})
+      return
+    try:
+      length = int(self.headers.get("Content-Length", 0))
+      request = json.loads(self.rfile.read(length))
+      if not isinstance(request, dict):
+        raise ValueError("Request body should be a JSON object")
+      profile = request.pop("profile", "bike")
+      out = self.server.service.score(request, profile)
+    except (ValueError, TypeError, KeyError, NetapyNetworkError) as e:
+      self._send_json(400, {"error": str(e)})
+      return
+    except Exception as e:
+      logger.exception("Scoring failed")
+      self._send_json(500, {"error": str(e)})
+      return
+    out = out.reset_index()
+    out["osmid"] = out["osmid"].astype(str)
+    self._send(200, out.to_json(na = "null"), "application/geo+json")
+
+  def log_message(self, format, *args):
+    logger.info(f"{self.address_string()} {format % args}")
+
+  def _send_json(self, status, obj):
+    self._send(status, json.dumps(obj), "application/json")
+
+  def _send(self, status, body, content_type):
+    body = body.encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+
+def create_server(service, host = "127.0.0.1", port = 8000):
+  server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+  server.daemon_threads = True
+  server.service = service
+  return server
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(
+    prog = "netapy.service",
+    description = "Serve street network suitability scores over HTTP"
+  )
+  parser.add_argument("--host", default = "127.0.0.1")
+  parser.add_argument("--port", type = int, default = 8000)
+  parser.add_argument("--extract", metavar = "FILE",
+                      help = "cut areas out of this OSM XML extract instead of querying OSM")
+  parser.add_argument("--layer", action = "append", default = [], metavar = "NAME=FILE",
+                      help = "read a network layer from file instead of fetching it (repeatable)")
+  parser.add_argument("-p", "--profile", action = "append", dest = "profiles",
+                      help = "name of a default profile to serve (repeatable, default: all)")
+  parser.add_argument("--max-networks", type = int, default = 8,
+                      help = "number of networks to keep in memory")
+  parser.add_argument("--max-results", type = int, default = 64,
+                      help = "number of scored areas to keep in memory")
+  parser.add_argument("--attribute-store", metavar = "FILE",
+                      help = "persistent store for derived attributes")
+  parser.add_argument("--compact", action = "store_true",
+                      help = "store edge attributes column-wise to reduce memory usage")
+  args = parser.parse_args(argv)
+  logging.basicConfig(level = logging.INFO)
+  layers = dict(x.split("=", 1) for x in args.layer)
+  loader = None if args.extract is None else ExtractLoader(args.extract, compact = args.compact)
+  service = ScoringService(args.profiles, loader, layers, args.max_networks,
+                           args.max_results, args.attribute_store, args.compact)
+  server = create_server(service, args.host, args.port)
+  logger.info(f"Serving on http://{args.host}:{args.port}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    service.close()
+
+def _load_from_osm(area, compact = False):
+  from netapy.networks import NetascoreNetwork
+  if "bbox" in area:
+    return NetascoreNetwork.from_bbox(area["bbox"], compact = compact)
+  if "place" in area:
+    return NetascoreNetwork.from_place(area["place"], compact = compact)
+  return NetascoreNetwork.from_polygon(_get_area_geometry(area), compact = compact)
+
+def _get_area_geometry(area):
+  shapely = utils.lazy_import("shapely")
+  if "bbox" in area:
+    return shapely.box(*area["bbox"])
+  if "polygon" in area:
+    return shapely.geometry.shape(area["polygon"])
+  raise ValueError("Area should be given as 'bbox', 'place' or 'polygon'")
+
+def _get_area_key(area):
+  # Equal areas should map to equal keys regardless of how they are written.
+  if "bbox" in area:
+    bbox = [float(x) for x in area["bbox"]]
+    if len(bbox) != 4:
+      raise ValueError("A bbox should consist of four coordinates")
+    return ("bbox", tuple(round(x, 7) for x in bbox))
+  if "place" in area:
+    return ("place", str(area["place"]).strip().lower())
+  if "polygon" in area:
+    shapely = utils.lazy_import("shapely")
+    geom = shapely.normalize(shapely.set_precision(_get_area_geometry(area), 1e-7))
+    return ("polygon", geom.wkb)
+  raise ValueError("Area should be given as 'bbox', 'place' or 'polygon'")
+
+if __name__ == "__main__":
+  main()
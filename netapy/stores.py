@@ -0,0 +1,107 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+from netapy import utils
+
+np = utils.lazy_import("numpy")
+
+
+class AttributeStore():
+
+  # Persistent store of derived attribute values, shared across runs.
+  # Entries are keyed by attribute label, OSM way id and a fingerprint of all
+  # inputs that the derivation depends on, including the version of its rules
+  # and of the layers it uses. Changed inputs therefore never hit old entries.
+  # A store may be shared across threads, each of which uses its own
+  # connection, since sqlite connections can only be used by their creator.
+  def __init__(self, filepath, layer_versions = None):
+    self.filepath = filepath
+    self.layer_versions = {} if layer_versions is None else dict(layer_versions)
+    self._local = threading.local()
+    self._connections = []
+    self._lock = threading.Lock()
+    self._connection.execute(
+      "CREATE TABLE IF NOT EXISTS attributes ("
+      "label TEXT, osmid TEXT, fingerprint TEXT, directed INTEGER, value TEXT, "
+      "PRIMARY KEY (label, osmid, fingerprint))"
+    )
+    self._connection.commit()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  @property
+  def _connection(self):
+    connection = getattr(self._local, "connection", None)
+    if connection is None:
+      # Connections are only used by their own thread, but may be closed by another.
+      connection = sqlite3.connect(self.filepath, timeout = 30, check_same_thread = False)
+      self._local.connection = connection
+      with self._lock:
+        self._connections.append(connection)
+    return connection
+
+  def close(self):
+    # Closes the connections of all threads.
+    with self._lock:
+      connections, self._connections = self._connections, []
+    for connection in connections:
+      connection.close()
+    self._local = threading.local()
+
+  def get(self, label, keys, chunk_size = 500):
+    # Keys are (osmid, fingerprint) tuples.
+    # Returns a dict mapping each key that was found to its entry.
+    wanted = set(keys)
+    keys = list(wanted)
+    out = {}
+    for start in range(0, len(keys), chunk_size):
+      chunk = keys[start:(start + chunk_size)]
+      marks = ", ".join(["?"] * len(chunk))
+      query = (
+        "SELECT osmid, fingerprint, directed, value FROM attributes "
+        f"WHERE label = ? AND fingerprint IN ({marks})"
+      )
+      rows = self._connection.execute(query, [label] + [x[1] for x in chunk])
+      for osmid, fingerprint, directed, value in rows:
+        if (osmid, fingerprint) in wanted:
+          out[(osmid, fingerprint)] = {"directed": bool(directed), "value": json.loads(value)}
+    return out
+
+  def set(self, label, entries):
+    # Entries map (osmid, fingerprint) tuples to {"directed": ..., "value": ...}.
+    rows = [
+      (label, k[0], k[1], int(v["directed"]), json.dumps(v["value"], default = _to_builtin))
+      for k, v in entries.items()
+    ]
+    self._connection.executemany(
+      "INSERT OR REPLACE INTO attributes VALUES (?, ?, ?, ?, ?)",
+      rows
+    )
+    self._connection.commit()
+
+  def clear(self, label = None):
+    if label is None:
+      self._connection.execute("DELETE FROM attributes")
+    else:
+      self._connection.execute("DELETE FROM attributes WHERE label = ?", [label])
+    self._connection.commit()
+
+  @staticmethod
+  def fingerprint(*parts):
+    digest = hashlib.sha1()
+    for x in parts:
+      digest.update(x if isinstance(x, bytes) else repr(x).encode("utf-8"))
+      digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _to_builtin(obj):
+  if isinstance(obj, np.generic):
+    return obj.item()
+  raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -1,6 +1,42 @@
-import pandas as pd
+import functools
+import importlib.util
 import operator
 import re
+import sys
+import threading
+
+# Names of all modules that were imported lazily.
+_LAZY_MODULES = []
+_LAZY_LOCK = threading.RLock()
+
+def lazy_import(name):
+  # Import a module only when one of its attributes is first accessed.
+  with _LAZY_LOCK:
+    try:
+      return sys.modules[name]
+    except KeyError:
+      pass
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+      raise ModuleNotFoundError(f"No module named '{name}'", name = name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _LAZY_MODULES.append(name)
+    return module
+
+def load_lazy_modules():
+  # Before Python 3.12 the first access to a lazily imported module is not
+  # thread-safe: threads accessing it at the same time may see it only
+  # partially initialized. Anything that uses netapy from multiple threads
+  # should therefore load all lazily imported modules before starting them.
+  with _LAZY_LOCK:
+    for name in _LAZY_MODULES:
+      getattr(sys.modules[name], "__name__")
+
+pd = lazy_import("pandas")
 
 def clean_string(obj, keep = "[^a-zA-Z0-9_.:\-]", strip = True):
   substr = re.sub(keep, "", obj)
@@ -65,4 +101,143 @@ def string_to_boolean(obj, fail = True):
     return False
   if fail:
     raise ValueError(f"Could not convert string to boolean: {obj}")
-  return None
\ No newline at end of file
+  return None
+
+# Implicit maxspeed values in km/h, following the OSM wiki.
+# Zones of any country (e.g. DE:zone30 or AT:zone:30) are parsed by their number.
+# Values without a fixed limit (e.g. DE:motorway, none, signals or variable) and
+# codes of countries that are not listed here are left unparsed.
+IMPLICIT_MAXSPEEDS = {
+  "at:urban": 50,
+  "at:rural": 100,
+  "at:trunk": 100,
+  "at:motorway": 130,
+  "at:bicycle_road": 30,
+  "ch:urban": 50,
+  "ch:rural": 80,
+  "ch:trunk": 100,
+  "ch:motorway": 120,
+  "de:urban": 50,
+  "de:rural": 100,
+  "de:living_street": 7,
+  "de:bicycle_road": 30,
+  "nl:urban": 50,
+  "nl:rural": 80,
+  "nl:trunk": 100,
+  "nl:motorway": 130,
+  "walk": 7
+}
+
+SPEED_UNITS = {
+  "": 1,
+  "km/h": 1,
+  "kmh": 1,
+  "kph": 1,
+  "mph": 1.609344,
+  "knots": 1.852
+}
+
+LENGTH_UNITS = {
+  "": 1,
+  "m": 1,
+  "meter": 1,
+  "meters": 1,
+  "metre": 1,
+  "metres": 1,
+  "km": 1000,
+  "cm": 0.01,
+  "mm": 0.001,
+  "ft": 0.3048,
+  "feet": 0.3048,
+  "mi": 1609.344
+}
+
+_NUMBER_WITH_UNIT = re.compile(r"^(-?\d+(?:\.\d+)?)\s*([a-z/]*)$")
+_NUMBER_RANGE = re.compile(r"^(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*([a-z/]*)$")
+_SPEED_ZONE = re.compile(r"^[a-z]{2}:zone:?(\d+)$")
+_FEET_INCHES = re.compile(r"^(?:(\d+(?:\.\d+)?)')?\s*(?:(\d+(?:\.\d+)?)\")?$")
+
+def parse_speed(obj, how = "max"):
+  return _parse_tag_series(obj, _parse_speed_value, how)
+
+def parse_length(obj, how = "max"):
+  return _parse_tag_series(obj, _parse_length_value, how)
+
+def parse_count(obj, how = "max"):
+  return _parse_tag_series(obj, _parse_count_value, how)
+
+def _parse_tag_series(obj, parser, how):
+  # Each distinct raw value is parsed only once.
+  # The parsed values are then mapped back onto the full series.
+  series = pd.Series(obj, dtype = object)
+  series = series.map(lambda x: ";".join(map(str, x)) if isinstance(x, list) else x)
+  lookup = {x:parser(x, how) for x in series.dropna().unique()}
+  return series.map(lookup).astype(float)
+
+def _parse_tag_value(obj, parser, how):
+  if isinstance(obj, bool):
+    return float("nan")
+  if isinstance(obj, (int, float)):
+    return float(obj)
+  # Semicolon-separated lists are reduced to a single value.
+  values = [parser(x) for x in str(obj).lower().replace(",", ".").split(";")]
+  values = [x for x in values if not pd.isnull(x)]
+  if not values:
+    return float("nan")
+  if how == "max":
+    return max(values)
+  if how == "min":
+    return min(values)
+  if how == "mean":
+    return sum(values) / len(values)
+  raise ValueError(f"Unsupported aggregation method: {how}")
+
+def _parse_quantity(obj, units):
+  obj = obj.strip()
+  match = _NUMBER_WITH_UNIT.match(obj)
+  if match:
+    number, unit = match.groups()
+    try:
+      return float(number) * units[unit]
+    except KeyError:
+      return float("nan")
+  # Ranges are represented by their midpoint.
+  match = _NUMBER_RANGE.match(obj)
+  if match:
+    lower, upper, unit = match.groups()
+    try:
+      return (float(lower) + float(upper)) / 2 * units[unit]
+    except KeyError:
+      return float("nan")
+  return float("nan")
+
+@functools.lru_cache(maxsize = 4096)
+def _parse_speed_value(obj, how = "max"):
+  def parse(x):
+    x = x.strip()
+    try:
+      return float(IMPLICIT_MAXSPEEDS[x])
+    except KeyError:
+      pass
+    match = _SPEED_ZONE.match(x)
+    if match:
+      return float(match.group(1))
+    return _parse_quantity(x, SPEED_UNITS)
+  return _parse_tag_value(obj, parse, how)
+
+@functools.lru_cache(maxsize = 4096)
+def _parse_length_value(obj, how = "max"):
+  def parse(x):
+    x = x.strip()
+    if "'" in x or '"' in x:
+      match = _FEET_INCHES.match(x)
+      if not match or not any(match.groups()):
+        return float("nan")
+      feet, inches = [float(y) if y else 0 for y in match.groups()]
+      return feet * 0.3048 + inches * 0.0254
+    return _parse_quantity(x, LENGTH_UNITS)
+  return _parse_tag_value(obj, parse, how)
+
+@functools.lru_cache(maxsize = 4096)
+def _parse_count_value(obj, how = "max"):
+  return _parse_tag_value(obj, lambda x: _parse_quantity(x, {"": 1}), how)
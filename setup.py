@@ -25,6 +25,11 @@ try:
 except FileNotFoundError:
   requirements = []
 
+# Optional requirements, for raster layers and grid coverage (rasterio) and
+# for routing and accessibility (scipy).
+extras = {"raster": ["rasterio"], "routing": ["scipy"]}
+extras["all"] = [x for v in extras.values() for x in v]
+
 setup(
   name = "netapy",
   version = version,
@@ -53,5 +58,9 @@ setup(
   ],
   packages = ["netapy"],
   platforms = "any",
-  install_requires = requirements
+  install_requires = requirements,
+  extras_require = extras,
+  entry_points = {
+    "console_scripts": ["netapy = netapy.cli:main"]
+  }
 )
\ No newline at end of file
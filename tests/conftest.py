@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+def write_extract(filepath, size = 6, seed = 2):
+  # Write a synthetic OSM XML extract with a grid of streets of random types,
+  # buildings, parks, cafes, crossings and a river. Only local data is used,
+  # such that tests never query OSM.
+  rng = random.Random(seed)
+  nodes = []
+  ways = []
+  grid = {}
+  nid = 1
+  for i in range(size):
+    for j in range(size):
+      grid[i, j] = nid
+      nodes.append((nid, 47.80 + i * 0.0008, 13.04 + j * 0.0011, {}))
+      nid += 1
+  highways = ["residential", "primary", "cycleway", "footway", "secondary", "track",
+              "service", "living_street", "tertiary", "path"]
+  for i in range(size):
+    for horizontal in [True, False]:
+      tags = {
+        "highway": rng.choice(highways),
+        "surface": rng.choice(["asphalt", "gravel", "paved", "sett"]),
+        "maxspeed": rng.choice(["30", "50", "20 mph"]),
+        "lanes": rng.choice(["1", "2", "3"]),
+        "width": rng.choice(["3", "5 m", "7"])
+      }
+      if rng.random() < 0.3:
+        tags["oneway"] = "yes"
+      refs = [grid[(i, j) if horizontal else (j, i)] for j in range(size)]
+      ways.append((refs, tags))
+  def add_polygon(lat, lon, dlat, dlon, tags):
+    nonlocal nid
+    refs = []
+    for a, b in [(0, 0), (0, dlon), (dlat, dlon), (dlat, 0)]:
+      nodes.append((nid, lat + a, lon + b, {}))
+      refs.append(nid)
+      nid += 1
+    ways.append((refs + refs[:1], tags))
+  for i in range(size - 1):
+    for j in range(size - 1):
+      lat = 47.80 + i * 0.0008
+      lon = 13.04 + j * 0.0011
+      if rng.random() < 0.6:
+        add_polygon(lat + 0.0002, lon + 0.0002, 0.0003, 0.0004, {"building": "yes"})
+      if rng.random() < 0.3:
+        add_polygon(lat + 0.0001, lon + 0.0001, 0.0006, 0.0009, {"leisure": "park"})
+  for tags in [{"amenity": "cafe"}, {"highway": "crossing"}]:
+    for _ in range(size):
+      lat = 47.80 + rng.random() * 0.0008 * size
+      lon = 13.04 + rng.random() * 0.0011 * size
+      nodes.append((nid, lat, lon, tags))
+      nid += 1
+  nodes.append((nid, 47.80, 13.04, {}))
+  nodes.append((nid + 1, 47.81, 13.05, {}))
+  ways.append(([nid, nid + 1], {"waterway": "river"}))
+  with open(filepath, "w") as f:
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+    for n, lat, lon, tags in nodes:
+      tagstr = "".join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items())
+      f.write(f'<node id="{n}" version="1" lat="{lat}" lon="{lon}">{tagstr}</node>\n')
+    for i, (refs, tags) in enumerate(ways):
+      refstr = "".join(f'<nd ref="{r}"/>' for r in refs)
+      tagstr = "".join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items())
+      f.write(f'<way id="{i + 1}" version="1">{refstr}{tagstr}</way>\n')
+    f.write("</osm>\n")
+  return filepath
+
+@pytest.fixture(scope = "session")
+def extract(tmp_path_factory):
+  return str(write_extract(tmp_path_factory.mktemp("data") / "extract.osm"))
+
+@pytest.fixture
+def network(extract):
+  from netapy.networks import NetascoreNetwork
+  return NetascoreNetwork.from_file(extract)
+
+@pytest.fixture
+def deterministic(monkeypatch):
+  # Some derivations pick random values, which would make runs incomparable.
+  monkeypatch.setattr(random, "choices", lambda population, k = 1: [population[0]] * k)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from netapy import accessibility, routing
+
+def _graph():
+  # A path 0 -> 1 -> 2 -> 3 with a shortcut 0 -> 2 and a dead end 3 -> 4.
+  nodes = np.array(["a", "b", "c", "d", "e"])
+  sources = np.array([0, 1, 2, 0, 3])
+  targets = np.array([1, 2, 3, 2, 4])
+  costs = np.array([1.0, 1.0, 2.0, 3.0, 5.0])
+  edges = [(nodes[s], nodes[t], 0) for s, t in zip(sources, targets)]
+  lengths = np.array([10.0, 20.0, 30.0, 40.0, 50.0])
+  return routing.CSRGraph.from_arrays(nodes, sources, targets, costs, edges, lengths)
+
+def test_hull_areas_match_convex_hulls():
+  rng = np.random.default_rng(0)
+  sizes = [1, 2, 3, 50, 200]
+  groups = np.repeat(np.arange(len(sizes)), sizes)
+  points = rng.normal(size = (len(groups), 2))
+  # A group of collinear points has no area.
+  points[groups == 2] = [[0, 0], [1, 1], [2, 2]]
+  out = accessibility._hull_areas(points, groups)
+  for i in range(len(sizes)):
+    expected = shapely.convex_hull(shapely.multipoints(points[groups == i])).area
+    assert out[i] == pytest.approx(expected)
+
+def test_reachability_counts_completely_traversable_edges():
+  graph = _graph()
+  stats, catchment = accessibility.reachability(graph, ["a", "b", "e"], 4, chunk_size = 2)
+  assert stats["nodes"].tolist() == [4, 3, 1]
+  # From a, edge c -> d costs 2 + 2 and is within the budget, d -> e is not.
+  assert stats["length"].tolist() == [100, 50, 0]
+  expected = {("a", "b", 0): 1, ("b", "c", 0): 2, ("c", "d", 0): 2, ("a", "c", 0): 1, ("d", "e", 0): 0}
+  assert catchment.to_dict() == expected
+
+def test_reachability_area_of_reachable_nodes():
+  graph = _graph()
+  coords = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [5, 5]], dtype = float)
+  stats, _ = accessibility.reachability(graph, ["a", "c"], 4, coords)
+  assert stats["area"].tolist() == pytest.approx([1, 0])
+
+def test_network_accessibility_does_not_depend_on_chunks(network):
+  origins = list(network.nodes)[:7]
+  single, single_catchment = network.accessibility(origins, 300, chunk_size = 100)
+  chunked, chunked_catchment = network.accessibility(origins, 300, chunk_size = 2, workers = 2)
+  pd.testing.assert_frame_equal(single, chunked)
+  pd.testing.assert_series_equal(single_catchment, chunked_catchment)
+  for origin in origins[:3]:
+    alone, _ = network.accessibility([origin], 300)
+    pd.testing.assert_frame_equal(alone, single.loc[[origin]])
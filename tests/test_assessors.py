@@ -0,0 +1,186 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from netapy import defaults, indicators
+from netapy.assessors import NetascoreAssessor
+from netapy.profiles import NetascoreProfile
+
+def test_group_values_by_type():
+  values = [True, 1, 1.0, True, float("nan"), None, pd.NA, float("nan"), pd.NA, "a"]
+  groups = {(type(v).__name__, repr(v)): list(p) for v, p in NetascoreAssessor._group_values(values)}
+  assert groups == {
+    ("bool", "True"): [0, 3],
+    ("int", "1"): [1],
+    ("float", "1.0"): [2],
+    ("float", "nan"): [4, 7],
+    ("NoneType", "None"): [5],
+    ("NAType", "<NA>"): [6, 8],
+    ("str", "'a'"): [9]
+  }
+  unhashable = NetascoreAssessor._group_values([[1], [1]])
+  assert [list(p) for _, p in unhashable] == [[0], [1]]
+  assert NetascoreAssessor._group_values([]) == []
+
+def test_subindex_of_mixed_values(network):
+  values = [True, 2, pd.NA, "yes"]
+  def kernel(data):
+    out = np.empty(len(data), dtype = object)
+    out[:] = [values[i % len(values)] for i in range(len(data))]
+    return out
+  obj = indicators.Indicator("mixed", kernel, inputs = ["highway"])
+  profile = copy.deepcopy(dict(defaults.NETASCORE_PROFILES["bike"]))
+  profile["weights"]["mixed"] = 0.1
+  profile["indicator_mapping"].append({"indicator": "mixed", "mapping": {True: 1, "yes": 0.2}})
+  assessor = NetascoreAssessor(NetascoreProfile(profile, name = "mixed"), indicators = [obj])
+  attr = assessor.generate_attribute("mixed", network, write = False)
+  out = assessor.generate_subindex("mixed", network, write = False)
+  expected = {"True": 1, "2": np.nan, "<NA>": np.nan, "yes": 0.2}
+  for e, value in attr["data"].items():
+    assert np.isclose(out["data"][e], expected[str(value)], equal_nan = True)
+
+def test_sweep_result_does_not_depend_on_batch(network, deterministic):
+  assessor = NetascoreAssessor("bike")
+  weights = dict(assessor.profile.parsed["weights"])
+  alone = assessor.sweep_weights(network._overlay(), [weights])
+  # Gradients are missing without elevation, but only the second vector weights them.
+  batch = assessor.sweep_weights(network._overlay(), [weights, {**weights, "gradient": 0.1}])
+  for direction in ["forward", "backward"]:
+    assert alone[direction][0].notna().any()
+    assert alone[direction][0].equals(batch[direction][0])
+    assert batch[direction][1].isna().all()
+
+def test_sweep_matches_generate_index(network, deterministic):
+  profile = NetascoreAssessor("bike").profile
+  weights = dict(profile.parsed["weights"])
+  out = NetascoreAssessor("bike").sweep_weights(network._overlay(), [weights])
+  obj = NetascoreAssessor("bike").generate_index(network._overlay())
+  for direction in ["forward", "backward"]:
+    expected = [obj["data"][direction][e] for e in network.edges]
+    assert np.allclose(out[direction][0].to_numpy(), np.array(expected, dtype = float), equal_nan = True)
+
+@pytest.mark.parametrize("label", ["road_category", "bicycle_infrastructure",
+                                   "pedestrian_infrastructure"])
+def test_derive_with_list_valued_tags(network, label):
+  # Simplified networks hold lists of tag values of the merged ways.
+  *_, data = next(iter(network.edges(data = True)))
+  data["highway"] = ["residential", "service"]
+  obj = NetascoreAssessor("bike").generate_attribute(label, network, write = False)
+  values = obj["data"]["forward"] if obj["directed"] else obj["data"]
+  assert len(values) == network.number_of_edges()
+
+def _write_noise(network, filepath):
+  import geopandas as gpd
+  import shapely
+  xmin, ymin, xmax, ymax = network._get_edge_geometries(projected = True).total_bounds
+  xmid = (xmin + xmax) / 2
+  polys = [shapely.box(xmin - 10, ymin - 10, xmid, ymax + 10),
+           shapely.box(xmid, ymin - 10, xmax + 10, ymax + 10)]
+  layer = gpd.GeoDataFrame({"noise": [50.0, 70.0]}, geometry = polys, crs = network.projected_crs)
+  layer.to_crs(4326).to_file(filepath)
+  return layer
+
+def test_derive_noise_from_vector_layer(network, tmp_path):
+  layer = _write_noise(network, str(tmp_path / "noise.gpkg"))
+  network.add_noise(str(tmp_path / "noise.gpkg"))
+  obj = NetascoreAssessor("bike").generate_attribute("noise", network, write = False)
+  geoms = network._get_edge_geometries(projected = True)
+  for e, geom in geoms.items():
+    lengths = geom.intersection(layer.geometry).length.to_numpy()
+    expected = round((lengths * layer["noise"].to_numpy()).sum() / lengths.sum(), 0)
+    assert abs(obj["data"][e] - expected) <= 1
+  assert {50.0, 70.0} <= set(obj["data"].values())
+
+def _without_overrides(name):
+  profile = copy.deepcopy(dict(defaults.NETASCORE_PROFILES[name]))
+  profile["overrides"] = []
+  return NetascoreAssessor(NetascoreProfile(profile, name = f"{name}_plain"))
+
+def _forward(obj, edge):
+  return obj["data"]["forward"][edge] if obj["directed"] else obj["data"][edge]
+
+def test_index_override(network, deterministic):
+  network = network._overlay()
+  edges = list(network.edges)
+  for e in edges[:6]:
+    network.edges[e]["highway"] = "primary"
+  for e in edges[:3]:
+    network.edges[e]["sidewalk"] = "both"
+  assessor = NetascoreAssessor("walk")
+  out = assessor.generate_index(network, write = False)["data"]["forward"]
+  plain = _without_overrides("walk").generate_index(network, write = False)["data"]["forward"]
+  infra = assessor.generate_attribute("pedestrian_infrastructure", network, write = False)
+  roads = assessor.generate_attribute("road_category", network, write = False)
+  matches = [
+    _forward(infra, e) == "sidewalk" and _forward(roads, e) in ["primary", "secondary"]
+    for e in edges
+  ]
+  assert any(matches) and not all(matches)
+  for e, match in zip(edges, matches):
+    if match:
+      assert out[e] == 0.2
+    else:
+      assert np.isclose(out[e], plain[e], equal_nan = True)
+
+def test_weight_override(network, deterministic):
+  network = network._overlay()
+  edges = list(network.edges)
+  for e in edges:
+    network.edges[e]["grade"] = 0.0
+  for e in edges[:4]:
+    network.edges[e]["surface"] = "gravel"
+  for e in edges[2:6]:
+    network.edges[e]["grade"] = 0.1
+  assessor = NetascoreAssessor("bike")
+  out = assessor.generate_index(network, write = False)["data"]["forward"]
+  plain = _without_overrides("bike").generate_index(network, write = False)["data"]["forward"]
+  pavement = assessor.generate_attribute("pavement", network, write = False)
+  gradient = assessor.generate_attribute("gradient", network, write = False)
+  weights = dict(assessor.profile.parsed["weights"])
+  labels = list(weights) + ["gradient"]
+  subs = {x:assessor.generate_subindex(x, network, write = False) for x in labels}
+  matches = [
+    _forward(pavement, e) == "gravel" and _forward(gradient, e) in [-4, -3, 3, 4]
+    for e in edges
+  ]
+  assert any(matches) and not all(matches)
+  for e, match in zip(edges, matches):
+    if match:
+      # Gradient is only weighted where the override applies.
+      adjusted = {**weights, "pavement": 1.6, "gradient": 1.6}
+      values = [_forward(subs[x], e) for x in adjusted]
+      expected = np.average(values, weights = list(adjusted.values()))
+      assert out[e] == pytest.approx(round(expected, 2))
+    else:
+      assert np.isclose(out[e], plain[e], equal_nan = True)
+
+def _aggregate_edge(values, weights, ignore_nodata):
+  available = ~np.isnan(values)
+  if not ignore_nodata and (~available & (weights != 0)).any():
+    return np.nan, 1.0
+  denominator = weights[available].sum()
+  index = (values[available] * weights[available]).sum() / denominator if denominator else np.nan
+  return index, denominator / weights.sum()
+
+@pytest.mark.parametrize("ignore_nodata", [False, True])
+def test_aggregate_subindices_matches_per_edge_loop(ignore_nodata):
+  rng = np.random.default_rng(3)
+  matrix = rng.random((50, 4))
+  matrix[rng.random((50, 4)) < 0.3] = np.nan
+  matrix[0] = np.nan
+  weights = np.array([0.4, 0.3, 0.3, 0])
+  aggregate = NetascoreAssessor._aggregate_subindices
+  index, robustness = aggregate(matrix, weights, None, ignore_nodata)
+  for i, row in enumerate(matrix):
+    expected = _aggregate_edge(row, weights, ignore_nodata)
+    assert np.isclose(index[i], expected[0], equal_nan = True)
+    assert robustness[i] == pytest.approx(expected[1])
+  # Weight matrices and per edge weights give the same result as a single vector.
+  batch, _ = aggregate(matrix, np.column_stack([weights, weights[::-1]]), None, ignore_nodata)
+  assert np.allclose(batch[:, 0], index, equal_nan = True)
+  per_edge, _ = aggregate(matrix, np.tile(weights, (50, 1)), None, ignore_nodata, per_edge = True)
+  assert np.allclose(per_edge, index, equal_nan = True)
+  rounded, _ = aggregate(matrix, weights, 2, ignore_nodata)
+  assert np.allclose(rounded, np.round(index, 2), equal_nan = True)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from netapy import budget
+from netapy.assessors import NetascoreAssessor
+
+def _index(network, assessor, **kwargs):
+  obj = assessor.generate_index(network, **kwargs)
+  edges = list(network.edges)
+  return np.array([[obj["data"][d][e] for d in ["forward", "backward"]] for e in edges], dtype = float)
+
+@pytest.mark.parametrize("profile", ["bike", "walk"])
+def test_chunked_equals_single(network, deterministic, profile):
+  single = _index(network._overlay(), NetascoreAssessor(profile))
+  chunked = _index(network._overlay(), NetascoreAssessor(profile), chunk_size = 20)
+  assert np.array_equal(single, chunked, equal_nan = True)
+
+def test_budget_equals_single(network, deterministic, monkeypatch):
+  # Nothing fits in a budget below the memory already in use.
+  monkeypatch.setattr(budget, "MIN_CHUNK_SIZE", 25)
+  single = _index(network._overlay(), NetascoreAssessor("bike"))
+  assessor = NetascoreAssessor("bike", memory_budget = 1)
+  constrained = _index(network._overlay(), assessor)
+  assert assessor.memory_plan.strategy == "spill" and assessor.memory_plan.n_chunks > 1
+  assert np.array_equal(single, constrained, equal_nan = True)
+
+def test_spill_without_directory_leaves_no_files(network, deterministic, monkeypatch, tmp_path):
+  monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+  assessor = NetascoreAssessor("bike", memory_budget = 1)
+  with pytest.warns(UserWarning, match = "index_bike:pavement"):
+    assessor.generate_index(network)
+  assert assessor.memory_plan.spill_dir is None
+  assert assessor.memory_plan.read_spilled() is None
+  assert os.listdir(tmp_path) == []
+
+def test_spill_to_directory(network, deterministic, tmp_path):
+  spill_dir = str(tmp_path / "spill")
+  assessor = NetascoreAssessor("bike", memory_budget = 1, spill_dir = spill_dir)
+  network.assess(assessor)
+  spilled = assessor.memory_plan.read_spilled()
+  assert len(spilled) == network.number_of_edges()
+  assert "index_bike:forward" in network._get_edge_frame("index_bike:forward")
+  assert "index_bike:forward" not in spilled
+  # Spilled columns are not written to the network.
+  assert "index_bike:pavement" in spilled
+  assert all("index_bike:pavement" not in d for *_, d in network.edges(data = True))
+
+def test_plan_fetches_no_layers(network):
+  assessor = NetascoreAssessor("walk", memory_budget = 1024 ** 2)
+  assert network.buildings is None
+  assessor._plan_memory(network)
+  assert network.buildings is None
+
+def test_spill_without_written_columns_does_not_warn(network, deterministic, recwarn):
+  assessor = NetascoreAssessor("bike", memory_budget = 1)
+  assessor.generate_index(network, write_attrs = False, write_subs = False)
+  assert not [w for w in recwarn if "memory budget" in str(w.message)]
@@ -0,0 +1,42 @@
+import copy
+
+import pytest
+import yaml
+
+from netapy import cli, defaults
+
+def test_assess_extract(extract, tmp_path):
+  output = str(tmp_path / "out.parquet")
+  assert cli.main(["--extract", extract, "-o", output, "-p", "bike"]) == cli.EXIT_OK
+
+def test_missing_layer_is_input_error(extract, tmp_path):
+  # Noise is never fetched, so a profile weighting it needs a noise layer.
+  profile = copy.deepcopy(dict(defaults.NETASCORE_PROFILES["bike"]))
+  profile["weights"]["noise"] = 0.1
+  filepath = tmp_path / "noisy.yml"
+  filepath.write_text(yaml.safe_dump(profile))
+  output = str(tmp_path / "out.parquet")
+  argv = ["--extract", extract, "-o", output, "-p", str(filepath)]
+  assert cli.main(argv) == cli.EXIT_INPUT
+
+def test_missing_extract_is_input_error(tmp_path):
+  output = str(tmp_path / "out.parquet")
+  argv = ["--extract", str(tmp_path / "missing.osm"), "-o", output]
+  assert cli.main(argv) == cli.EXIT_INPUT
+
+@pytest.mark.parametrize("option, value", [("--layer-tolerance", "-1"), ("--layer-tolerance", "x"),
+                                           ("--coverage-resolution", "0"), ("--workers", "0")])
+def test_invalid_option_is_usage_error(extract, tmp_path, option, value):
+  output = str(tmp_path / "out.parquet")
+  with pytest.raises(SystemExit) as e:
+    cli.main(["--extract", extract, "-o", output, option, value])
+  assert e.value.code == cli.EXIT_USAGE
+
+def test_cache_dir_settings_are_restored(extract, tmp_path):
+  import osmnx as ox
+  previous = (ox.settings.use_cache, ox.settings.cache_folder)
+  output = str(tmp_path / "out.parquet")
+  argv = ["--extract", extract, "-o", output, "-p", "walk", "--cache-dir", str(tmp_path / "cache")]
+  assert cli.main(argv) == cli.EXIT_OK
+  assert (ox.settings.use_cache, ox.settings.cache_folder) == previous
+  assert (tmp_path / "cache" / "attributes.sqlite").exists()
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from netapy.assessors import NetascoreAssessor
+
+def _derive(network, label, resolution = None):
+  assessor = NetascoreAssessor("walk", coverage_resolution = resolution)
+  obj = getattr(assessor, f"derive_{label}")(network, write = False)
+  return np.array([obj["data"][e] for e in network.edges(keys = True)], dtype = float)
+
+@pytest.mark.parametrize("label", ["buildings", "greenness"])
+def test_grid_coverage_approximates_exact_coverage(network, label):
+  # See benchmarks/coverage.py for runtimes and other resolutions.
+  pytest.importorskip("rasterio")
+  exact = _derive(network, label)
+  approximated = _derive(network, label, resolution = 2)
+  assert exact.max() > 0
+  diff = np.abs(approximated - exact)
+  assert diff.mean() < 0.2 and diff.max() < 2
+
+def _reference_means(grid, transform, buffers):
+  # Mean of the cells whose center lies within each buffer, one buffer at a time.
+  from rasterio.features import geometry_mask
+  out = np.full(len(buffers), np.nan)
+  for i, geom in enumerate(buffers):
+    inside = geometry_mask([geom], out_shape = grid.shape, transform = transform, invert = True)
+    values = grid[inside & ~np.isnan(grid)]
+    if values.size:
+      out[i] = values.mean()
+  return out
+
+def test_grid_coverage_matches_buffer_masks(network):
+  pytest.importorskip("rasterio")
+  network._check_layer_presence("buildings", fetch = True)
+  out = network._compute_coverage_around_edges("buildings", 20, resolution = 2)
+  grid, _, transform = network._get_coverage_grid("buildings", 2, 20)
+  buffers = network._get_undirected_geometries(projected = True).buffer(20, cap_style = 2)
+  expected = np.nan_to_num(_reference_means(grid.astype(float), transform, buffers)) * 100
+  groups, _ = network._get_twin_index()
+  assert np.allclose(out.to_numpy(), expected[groups])
+
+def test_sample_raster_matches_buffer_masks(network, tmp_path):
+  rasterio = pytest.importorskip("rasterio")
+  from rasterio.transform import from_origin
+  from netapy.networks import RasterLayer
+  crs = network.projected_crs
+  xmin, ymin, xmax, ymax = network._get_edge_geometries(projected = True).total_bounds
+  transform = from_origin(xmin - 50, ymax + 50, 5, 5)
+  shape = (int((ymax - ymin + 100) / 5) + 1, int((xmax - xmin + 100) / 5) + 1)
+  data = np.random.default_rng(0).uniform(0, 1, shape)
+  data[::7, ::3] = -1
+  filepath = str(tmp_path / "green.tif")
+  with rasterio.open(filepath, "w", driver = "GTiff", height = shape[0], width = shape[1],
+                     count = 1, dtype = "float64", crs = crs.to_wkt(), transform = transform,
+                     nodata = -1) as dst:
+    dst.write(data, 1)
+  network.greenness = RasterLayer(filepath)
+  out = network._sample_raster_around_edges("greenness", 30)
+  buffers = network._get_undirected_geometries(projected = True).buffer(30, cap_style = 2)
+  expected = _reference_means(np.where(data == -1, np.nan, data), transform, buffers)
+  groups, _ = network._get_twin_index()
+  assert np.allclose(out.to_numpy(), expected[groups], equal_nan = True)
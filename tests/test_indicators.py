@@ -0,0 +1,123 @@
+import types
+
+import numpy as np
+import pytest
+
+from netapy import indicators
+from netapy.assessors import NetascoreAssessor
+from netapy.stores import AttributeStore
+
+@pytest.fixture(autouse = True)
+def registry(monkeypatch):
+  monkeypatch.setattr(indicators, "_REGISTRY", {})
+  monkeypatch.setattr(indicators, "_ENTRY_POINTS_LOADED", True)
+
+def _lighting(data):
+  return (data["highway"] == "residential").to_numpy()
+
+def test_register_and_unregister():
+  obj = indicators.register(indicators.Indicator("lighting", _lighting, inputs = ["highway"]))
+  assert indicators.get_registered() == {"lighting": obj}
+  with pytest.raises(ValueError, match = "already registered"):
+    indicators.register(indicators.Indicator("lighting", _lighting))
+  other = indicators.register(indicators.Indicator("lighting", _lighting), replace = True)
+  assert indicators.get_registered()["lighting"] is other
+  indicators.unregister("lighting")
+  assert indicators.get_registered() == {}
+  with pytest.raises(ValueError, match = "not registered"):
+    indicators.unregister("lighting")
+
+def test_decorator_registers_kernel():
+  @indicators.indicator("lighting", inputs = ["highway"])
+  def kernel(data):
+    return np.zeros(len(data))
+  assert indicators.get_registered()["lighting"].kernel is kernel
+
+def test_invalid_indicators():
+  with pytest.raises(ValueError, match = "built-in"):
+    indicators.register(indicators.Indicator("width", _lighting))
+  with pytest.raises(ValueError, match = "identifier"):
+    indicators.Indicator("not valid", _lighting)
+  with pytest.raises(ValueError, match = "callable"):
+    indicators.Indicator("lighting", None)
+
+def test_entry_points(monkeypatch):
+  first = indicators.Indicator("lighting", _lighting)
+  second = indicators.Indicator("shade", _lighting)
+  def broken():
+    raise ImportError("broken")
+  entries = [
+    types.SimpleNamespace(name = "one", load = lambda: first),
+    types.SimpleNamespace(name = "many", load = lambda: [second]),
+    types.SimpleNamespace(name = "broken", load = broken)
+  ]
+  groups = {indicators.ENTRY_POINT_GROUP: entries}
+  selectable = types.SimpleNamespace(select = lambda group: groups.get(group, []))
+  monkeypatch.setattr("importlib.metadata.entry_points", lambda: selectable)
+  monkeypatch.setattr(indicators, "_ENTRY_POINTS_LOADED", False)
+  assert indicators.get_registered() == {"lighting": first, "shade": second}
+
+def test_undirected_kernel(network):
+  calls = []
+  def kernel(data):
+    calls.append(len(data))
+    return data["geometry"].length.to_numpy()
+  obj = indicators.Indicator("length", kernel, inputs = ["geometry"])
+  assessor = NetascoreAssessor("bike", indicators = [obj])
+  out = assessor.generate_attribute("length", network)
+  # Reverse edges share one kernel row.
+  assert calls == [len(network._get_twin_index()[1])] and calls[0] < network.number_of_edges()
+  lengths = network._get_edge_geometries(projected = True).length
+  assert np.allclose([out["data"][e] for e in lengths.index], lengths.to_numpy())
+
+def test_directed_kernel(network, deterministic):
+  directions = []
+  def kernel(data, direction):
+    directions.append(direction)
+    return np.where(data["access_bicycle"], 1.0 if direction == "forward" else 2.0, 0.0)
+  obj = indicators.Indicator("access", kernel, inputs = ["access_bicycle"], directed = True)
+  assessor = NetascoreAssessor("bike", indicators = [obj])
+  out = assessor.generate_attribute("access", network)
+  assert directions == ["forward", "backward"]
+  assert set(out["data"]["forward"].values()) == {1.0}
+  assert set(out["data"]["backward"].values()) == {2.0}
+  with pytest.raises(ValueError, match = "can not use directed"):
+    undirected = indicators.Indicator("access", kernel, inputs = ["access_bicycle"])
+    NetascoreAssessor("bike", indicators = [undirected]).generate_attribute("access", network)
+
+def test_store_round_trip(network, tmp_path):
+  calls = []
+  def kernel(data):
+    calls.append(len(data))
+    return (data["highway"] == "residential").to_numpy()
+  obj = indicators.Indicator("lighting", kernel, inputs = ["highway"])
+  filepath = str(tmp_path / "store.db")
+  values = []
+  for _ in range(2):
+    with AttributeStore(filepath) as store:
+      assessor = NetascoreAssessor("bike", indicators = [obj], attribute_store = store)
+      values.append(assessor.generate_attribute("lighting", network._overlay(), write = False)["data"])
+  assert len(calls) == 1
+  assert values[0] == values[1]
+
+def test_store_keys_depend_on_builtin_inputs(network, tmp_path):
+  obj = indicators.Indicator("shade", lambda data: data["buildings"], inputs = ["buildings"])
+  keys = {}
+  with AttributeStore(str(tmp_path / "store.db"), {"buildings": "v1"}) as store:
+    for resolution in [None, 2, 4]:
+      assessor = NetascoreAssessor("bike", indicators = [obj], attribute_store = store,
+                                   coverage_resolution = resolution)
+      assert assessor._is_storable("shade", network)
+      keys[resolution] = set(assessor._get_store_keys("shade", network).values())
+    rules = assessor._get_rules("shade")
+  assert keys[None].isdisjoint(keys[2]) and keys[2].isdisjoint(keys[4])
+  # Changes to the built-in derivation change the rules of the indicator as well.
+  assert "def derive_buildings" in rules[1]
+
+def test_replaced_layer_is_projected_again(network):
+  network._check_layer_presence("buildings", fetch = True)
+  first = network._get_projected_layer("buildings")
+  assert network._get_projected_layer("buildings") is first
+  network.buildings = network.buildings.iloc[:1].copy()
+  second = network._get_projected_layer("buildings")
+  assert len(second) == 1
@@ -0,0 +1,350 @@
+import copy
+import threading
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from netapy import defaults
+from netapy.assessors import NetascoreAssessor
+from netapy.networks import EdgeAttributeStore, EdgeAttributeView, NetascoreNetwork
+from netapy.profiles import NetascoreProfile
+
+def test_store_overlay_copies_changed_columns_only():
+  store = EdgeAttributeStore(capacity = 2)
+  views = [store.new_view() for _ in range(2)]
+  views[0]["a"] = 1.0
+  views[1]["a"] = 2.0
+  views[0]["b"] = "x"
+  new = store.overlay()
+  assert new._columns["a"][0] is store._columns["a"][0]
+  new.set("a", 0, 3.0)
+  new.delete("b", 0)
+  assert store.get("a", 0) == 1.0 and store.get("b", 0) == "x"
+  assert new.get("a", 0) == 3.0 and "b" not in new.keys(0)
+  # Changes to the base are not visible in the overlay either.
+  store.set("a", 1, 4.0)
+  assert new.get("a", 1) == 2.0
+  # Growing the overlay does not affect the base.
+  idx = new.new_view()._idx
+  new.set("a", idx, 5.0)
+  assert len(store) == 2 and store._capacity == 2
+
+def _edge_data(network):
+  return [dict(d) for *_, d in network.edges(keys = True, data = True)]
+
+def test_overlay_of_compact_network(extract, deterministic):
+  network = NetascoreNetwork.from_file(extract, compact = True)
+  before = _edge_data(network)
+  assessor = NetascoreAssessor("bike")
+  assessed = network.assess(assessor, inplace = False)
+  assert assessed.compact
+  assert _edge_data(network) == before
+  names = assessor._find_index_colnames()
+  expected = NetascoreNetwork.from_file(extract).assess(assessor, inplace = False)
+  values = assessed._get_edge_attributes(*names).to_numpy(dtype = float)
+  assert np.array_equal(values, expected._get_edge_attributes(*names).to_numpy(dtype = float),
+                        equal_nan = True)
+
+def test_overlay_of_network(network, deterministic):
+  before = _edge_data(network)
+  assessed = network.assess(NetascoreAssessor("bike"), inplace = False)
+  assert not assessed.compact
+  assert _edge_data(network) == before
+  assert all("index_bike:forward" in d for d in _edge_data(assessed))
+
+def test_clean_removes_derived_columns(network, deterministic):
+  keys = set().union(*_edge_data(network))
+  assessor = NetascoreAssessor("bike")
+  network.assess(assessor)
+  assert all("index_bike:forward" in d for d in _edge_data(network))
+  cleaned = network.clean(assessor, inplace = False, keep = ["index_bike:forward"])
+  assert set().union(*_edge_data(cleaned)) == keys | {"index_bike:forward"}
+  network.clean(assessor)
+  assert set().union(*_edge_data(network)) == keys
+
+def test_osmnx_settings_with_equal_values_overlap():
+  import osmnx as ox
+  from netapy.networks import osmnx_settings
+  previous = ox.settings.use_cache
+  barrier = threading.Barrier(2, timeout = 5)
+  errors = []
+  def work():
+    try:
+      with osmnx_settings(use_cache = not previous):
+        # Both threads only pass the barrier if they are in scope at once.
+        barrier.wait()
+        assert ox.settings.use_cache == (not previous)
+    except Exception as e:
+      errors.append(e)
+  threads = [threading.Thread(target = work) for _ in range(2)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert not errors
+  assert ox.settings.use_cache == previous
+
+def test_osmnx_settings_with_different_values_wait():
+  import osmnx as ox
+  from netapy.networks import osmnx_settings
+  previous = ox.settings.cache_folder
+  entered = threading.Event()
+  release = threading.Event()
+  seen = []
+  def first():
+    with osmnx_settings(cache_folder = "a"):
+      entered.set()
+      release.wait(5)
+      seen.append(ox.settings.cache_folder)
+  def second():
+    with osmnx_settings(cache_folder = "b"):
+      seen.append(ox.settings.cache_folder)
+  threads = [threading.Thread(target = first), threading.Thread(target = second)]
+  threads[0].start()
+  entered.wait(5)
+  threads[1].start()
+  threads[1].join(0.2)
+  assert threads[1].is_alive()
+  release.set()
+  for t in threads:
+    t.join()
+  assert seen == ["a", "b"]
+  assert ox.settings.cache_folder == previous
+
+def test_osmnx_settings_are_restored_after_errors():
+  import osmnx as ox
+  from netapy.networks import osmnx_settings
+  previous = ox.settings.useful_tags_way
+  with pytest.raises(KeyError):
+    with osmnx_settings(useful_tags_way = ["highway"]):
+      raise KeyError("x")
+  assert ox.settings.useful_tags_way == previous
+  with pytest.raises(RuntimeError):
+    with osmnx_settings(useful_tags_way = ["highway"]):
+      with osmnx_settings(useful_tags_way = ["name"]):
+        pass
+  assert ox.settings.useful_tags_way == previous
+
+def test_networks_load_in_parallel(extract):
+  import osmnx as ox
+  barrier = threading.Barrier(2, timeout = 5)
+  def loader(**kwargs):
+    barrier.wait()
+    return ox.graph_from_xml(**kwargs)
+  out = []
+  def work():
+    kwargs = {"filepath": extract, "simplify": False}
+    out.append(NetascoreNetwork._from_query(loader, "file", kwargs))
+  threads = [threading.Thread(target = work) for _ in range(2)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert len(out) == 2 and out[0].number_of_edges() == out[1].number_of_edges() > 0
+
+def test_twin_index_pairs_reverse_edges(network):
+  groups, firsts = network._get_twin_index()
+  edges = list(network.edges(keys = True))
+  assert len(groups) == len(edges) and len(firsts) < len(edges)
+  for g in np.unique(groups):
+    members = [edges[i] for i in np.flatnonzero(groups == g)]
+    assert len(members) <= 2
+    if len(members) == 2:
+      (u1, v1, _), (u2, v2, _) = members
+      assert (u1, v1) == (v2, u2)
+
+def test_vector_noise_is_equal_for_twins(network, tmp_path):
+  import geopandas as gpd
+  import shapely
+  xmin, ymin, xmax, ymax = network._get_edge_geometries(projected = True).total_bounds
+  polys = [shapely.box(xmin - 10, ymin - 10, (xmin + xmax) / 2, ymax + 10)]
+  layer = gpd.GeoDataFrame({"noise": [55.0]}, geometry = polys, crs = network.projected_crs)
+  layer.to_crs(4326).to_file(str(tmp_path / "noise.gpkg"))
+  network.add_noise(str(tmp_path / "noise.gpkg"))
+  obj = NetascoreAssessor("bike").generate_attribute("noise", network, write = False)
+  groups, _ = network._get_twin_index()
+  values = [obj["data"][e] for e in network.edges(keys = True)]
+  for g in np.unique(groups):
+    members = {values[i] for i in np.flatnonzero(groups == g)}
+    assert len(members) == 1 or all(np.isnan(list(members)))
+  # Edges outside all polygons have no noise level.
+  assert np.isnan(values).any() and 55.0 in values
+
+def test_csr_uses_forward_index_of_reversed_edges(network, deterministic):
+  network = network._overlay()
+  u, v, k = next((u, v, k) for u, v, k in network.edges(keys = True) if network.has_edge(v, u))
+  # Make the edge a one-way uphill edge that runs against its OSM way.
+  network.remove_edges_from([(v, u, x) for x in list(network[v][u])])
+  data = network.edges[u, v, k]
+  data["reversed"] = True
+  data["oneway"] = True
+  data["grade"] = 0.1
+  profile = copy.deepcopy(dict(defaults.NETASCORE_PROFILES["bike"]))
+  profile["weights"]["gradient"] = 0.2
+  assessor = NetascoreAssessor(NetascoreProfile(profile, name = "gradient"))
+  network.assess(assessor)
+  names = [assessor._construct_index_colname(direction = d) for d in ["forward", "backward"]]
+  forward, backward = data[names[0]], data[names[1]]
+  assert forward != backward
+  graph = network.to_csr(assessor)
+  costs = dict(zip(graph.edges, graph.costs))
+  assert costs[(u, v, k)] == pytest.approx(data["length"] * (2 - forward))
+
+def _weighted_quantile(values, weights, q):
+  order = np.argsort(values, kind = "stable")
+  fractions = np.cumsum(weights[order]) / weights.sum()
+  return values[order][np.searchsorted(fractions, max(q, 1e-12) - 1e-12)]
+
+def test_weighted_stats_match_per_group_stats():
+  rng = np.random.default_rng(1)
+  groups = rng.integers(0, 4, 200)
+  values = rng.random(200).round(2)
+  values[rng.random(200) < 0.1] = np.nan
+  weights = rng.random(200) * 100
+  # The last group is empty.
+  out = NetascoreNetwork._weighted_stats(values, weights, groups, 5, (0, 0.5, 0.9), 0.5)
+  for i in range(4):
+    mask = (groups == i) & ~np.isnan(values)
+    v, w = values[mask], weights[mask]
+    assert out["mean"][i] == pytest.approx(np.average(v, weights = w))
+    assert out["share>=0.5"][i] == pytest.approx(w[v >= 0.5].sum() / w.sum())
+    for q in (0, 0.5, 0.9):
+      assert out[f"q{q:g}"][i] == _weighted_quantile(v, w, q)
+  assert all(np.isnan(x[4]) for x in out.values())
+
+@pytest.mark.parametrize("grid", ["hex", "square"])
+def test_aggregate_preserves_network_length(network, deterministic, grid):
+  network = network._overlay()
+  assessor = NetascoreAssessor("bike")
+  network.assess(assessor)
+  edges = network._get_edge_geometries(projected = True)
+  name = assessor._construct_index_colname(direction = "forward")
+  values = network._get_edge_attributes(name)[name].to_numpy(dtype = float)
+  cells = network.aggregate(assessor, resolution = 100, grid = grid)
+  assert len(cells) > 1
+  assert cells["length"].sum() == pytest.approx(edges.length.sum())
+  # A single zone covering the whole network holds the length-weighted mean.
+  zone = gpd.GeoDataFrame(geometry = [cells.union_all().envelope], crs = cells.crs)
+  zone = network.aggregate(assessor, zones = zone)
+  valid = ~np.isnan(values)
+  expected = np.average(values[valid], weights = edges.length.to_numpy()[valid])
+  assert zone[f"{name}:mean"].iloc[0] == pytest.approx(expected)
+
+def test_geometries_match_graph_to_gdfs(network):
+  import osmnx as ox
+  nodes, edges = ox.graph_to_gdfs(network)
+  points = network._get_node_geometries()
+  lines = network._get_edge_geometries()
+  assert points.crs == nodes.crs and lines.crs == edges.crs
+  assert points.reindex(nodes.index).geom_equals(nodes.geometry).all()
+  assert lines.reindex(edges.index).geom_equals_exact(edges.geometry, 1e-9).all()
+
+def test_geometry_cache_is_invalidated(network):
+  network = network._overlay()
+  lines = network._get_edge_geometries()
+  assert network._get_edge_geometries() is lines
+  projected = network._get_edge_geometries(projected = True)
+  assert projected.crs == network.projected_crs
+  u, v, k = next(iter(network.edges(keys = True)))
+  network.remove_edge(u, v, k)
+  assert len(network._get_edge_geometries()) == len(lines) - 1
+  assert len(network._get_edge_geometries(projected = True)) == len(projected) - 1
+
+def test_store_columns_by_type():
+  store = EdgeAttributeStore(capacity = 1)
+  first, second = store.new_view(), store.new_view()
+  assert store._capacity == 2
+  first["length"] = 1.5
+  assert store._columns["length"][0].dtype == float
+  # Any other value converts a float column into an object column.
+  second["length"] = "2"
+  values, _ = store._columns["length"]
+  assert values.dtype == object and first["length"] == 1.5 and second["length"] == "2"
+  first["highway"] = "residential"
+  assert "highway" not in second and dict(second) == {"length": "2"}
+  del first["highway"]
+  assert "highway" not in first
+  with pytest.raises(KeyError):
+    del first["highway"]
+  store.drop_columns("length")
+  assert store.columns == ["highway"] and len(first) == 0
+
+def test_compact_network_equals_network(extract, network):
+  compact = NetascoreNetwork.from_file(extract, compact = True)
+  assert compact.compact and not network.compact
+  assert list(compact.edges(keys = True)) == list(network.edges(keys = True))
+  assert _edge_data(compact) == _edge_data(network)
+  # Edge data are views into the columns of a single store.
+  u, v, k = next(iter(compact.edges(keys = True)))
+  compact[u][v][k]["width"] = 2.0
+  assert isinstance(compact[u][v][k], EdgeAttributeView)
+  assert compact[u][v][k]._store.get("width", compact[u][v][k]._idx) == 2.0
+
+def _split_edge(network):
+  # Split a pair of twin edges at a new midpoint node, forming chains of two edges.
+  # Returns the network and a mapping from each new edge to the edge it replaced.
+  network = network._overlay()
+  u, v, k = next((u, v, k) for u, v, k in network.edges(keys = True) if network.has_edge(v, u))
+  j = next(iter(network[v][u]))
+  replaced = {}
+  network.add_node("mid", x = (network.nodes[u]["x"] + network.nodes[v]["x"]) / 2,
+                   y = (network.nodes[u]["y"] + network.nodes[v]["y"]) / 2)
+  for a, b, c in [(u, v, k), (v, u, j)]:
+    data = {x:y for x, y in network[a][b][c].items() if x != "geometry"}
+    data["length"] /= 2
+    network.remove_edge(a, b, c)
+    for e in [(a, "mid"), ("mid", b)]:
+      replaced[(*e, network.add_edge(*e, **data))] = (a, b, c)
+  return network, replaced
+
+def test_segments_merge_chains(network):
+  split, replaced = _split_edge(network)
+  assert split._is_chain_node("mid")
+  segments, members = split._get_segments()
+  assert "mid" not in segments
+  assert set(e for x in members.values() for e in x) == set(split.edges(keys = True))
+  assert sum(len(x) for x in members.values()) == split.number_of_edges()
+  for segment, edges in members.items():
+    if any(e in replaced for e in edges):
+      original = replaced[edges[0]]
+      assert [replaced[e] for e in edges] == [original, original]
+      assert segments.edges[segment]["length"] == pytest.approx(network.edges[original]["length"])
+
+def test_assess_simplified_equals_raw(network, deterministic):
+  split, replaced = _split_edge(network)
+  assessor = NetascoreAssessor("bike")
+  raw = network.assess(assessor, inplace = False)
+  simplified = split.assess(assessor, inplace = False, simplify = True)
+  names = [assessor._construct_index_colname(direction = d) for d in ["forward", "backward"]]
+  for a, b, c, data in simplified.edges(keys = True, data = True):
+    expected = raw.edges[replaced.get((a, b, c), (a, b, c))]
+    assert np.allclose([data[x] for x in names], [expected[x] for x in names], equal_nan = True)
+  assert not np.isnan([simplified.edges[e][names[0]] for e in replaced]).all()
+
+def _write_layer(network, filepath, **kwargs):
+  # One feature near the network and one far away from it.
+  center = network._get_extent().to_crs(4326).iloc[0].centroid
+  points = [center, shapely.Point(center.x + 1, center.y + 1)]
+  layer = gpd.GeoDataFrame({"noise": [60, 70], "other": ["a", "b"]}, geometry = points, crs = 4326)
+  if str(filepath).endswith(".parquet"):
+    layer.to_parquet(filepath, **kwargs)
+  else:
+    layer.to_file(filepath, **kwargs)
+
+@pytest.mark.parametrize("filename, kwargs", [
+  ("layer.gpkg", {}),
+  ("layer.parquet", {}),
+  ("layer.parquet", {"write_covering_bbox": True})
+])
+def test_add_layer_from_file(network, tmp_path, filename, kwargs):
+  filepath = tmp_path / filename
+  _write_layer(network, filepath, **kwargs)
+  network.add_layer_from_file("custom", filepath, columns = ["noise"])
+  assert list(network.custom.columns) == ["noise", "geometry"]
+  assert network.custom["noise"].tolist() == [60]
+  assert "custom" in network._layer_names
+  network.add_layer_from_file("custom", filepath, clip = False)
+  assert network.custom["noise"].tolist() == [60, 70]
+  assert "other" in network.custom.columns
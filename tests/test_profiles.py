@@ -0,0 +1,38 @@
+import copy
+
+import pytest
+
+from netapy import defaults
+from netapy.exceptions import NetapyProfileError
+from netapy.profiles import NetascoreProfile
+
+def _profile(name, **changes):
+  profile = copy.deepcopy(dict(defaults.NETASCORE_PROFILES[name]))
+  profile.update(changes)
+  return NetascoreProfile(profile, name = name)
+
+def test_parse_weight_override():
+  override = _profile("bike").parsed["overrides"][0]
+  assert override["type"] == "weight"
+  assert override["for"] == ["pavement", "gradient"]
+  assert override["mapping"]["indicator"] == "pavement"
+  rule, nested = list(override["mapping"]["rules"].items())[0]
+  assert rule("gravel") and not rule("asphalt")
+  assert nested["indicator"] == "gradient"
+  assert [x(3) for x in nested["rules"]] == [True]
+
+def test_parse_index_override():
+  override = _profile("walk").parsed["overrides"][0]
+  assert override["type"] == "index" and override["for"] == []
+
+def test_parse_without_overrides():
+  assert _profile("bike", overrides = None).parsed["overrides"] == []
+
+def test_invalid_overrides():
+  override = copy.deepcopy(defaults.NETASCORE_PROFILES["bike"]["overrides"][0])
+  override["output"] = {"type": "subindex"}
+  with pytest.raises(NetapyProfileError):
+    _profile("bike", overrides = [override]).parsed
+  override["output"] = {"type": "weight", "for": "unknown"}
+  with pytest.raises(NetapyProfileError):
+    _profile("bike", overrides = [override]).parsed
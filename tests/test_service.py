@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from netapy.service import ExtractLoader, LRUCache, ScoringService, create_server
+from netapy.stores import AttributeStore
+
+BBOX = [13.0, 47.7, 13.1, 47.9]
+
+def test_lru_cache_evicts_least_recently_used():
+  cache = LRUCache(2)
+  cache.put("a", 1)
+  cache.put("b", 2)
+  assert cache.get("a") == 1
+  cache.put("c", 3)
+  assert "b" not in cache
+  assert cache.get("a") == 1 and cache.get("c") == 3
+  assert cache.get("b", "x") == "x"
+  assert len(cache) == 2
+  cache.clear()
+  assert len(cache) == 0
+
+@pytest.fixture
+def service(extract):
+  service = ScoringService(["bike"], ExtractLoader(extract))
+  yield service
+  service.close()
+
+def test_concurrent_requests_are_coalesced(extract):
+  calls = []
+  started = threading.Event()
+  release = threading.Event()
+  loader = ExtractLoader(extract)
+  def slow_loader(area):
+    calls.append(area)
+    started.set()
+    release.wait(10)
+    return loader(area)
+  service = ScoringService(["bike"], slow_loader)
+  results = []
+  def work():
+    results.append(service.score({"bbox": BBOX}, "bike"))
+  threads = [threading.Thread(target = work) for _ in range(4)]
+  threads[0].start()
+  started.wait(10)
+  for t in threads[1:]:
+    t.start()
+  while service.metrics()["counts"]["coalesced"] < 3:
+    time.sleep(0.01)
+  release.set()
+  for t in threads:
+    t.join()
+  assert len(calls) == 1
+  assert len(results) == 4 and all(x is results[0] for x in results)
+  assert service.score({"bbox": BBOX}, "bike") is results[0]
+  assert service.metrics()["counts"]["result_hits"] == 1
+
+def test_shared_store_stays_open(extract, tmp_path):
+  store = AttributeStore(str(tmp_path / "store.db"))
+  service = ScoringService(["bike"], ExtractLoader(extract), attribute_store = store)
+  service.score({"bbox": BBOX}, "bike")
+  service.clear()
+  # A closed store would fail on the second request.
+  service.score({"bbox": BBOX}, "bike")
+  service.close()
+  store._connection.execute("SELECT 1")
+  store.close()
+
+@pytest.fixture
+def url(service):
+  server = create_server(service, port = 0)
+  thread = threading.Thread(target = server.serve_forever, daemon = True)
+  thread.start()
+  yield f"http://127.0.0.1:{server.server_address[1]}"
+  server.shutdown()
+  server.server_close()
+
+def _request(url, path, body = None):
+  data = None if body is None else body.encode("utf-8")
+  try:
+    with urllib.request.urlopen(url + path, data) as response:
+      return response.status, json.loads(response.read())
+  except urllib.error.HTTPError as e:
+    return e.code, json.loads(e.read())
+
+def test_handler_scores_area(url):
+  status, out = _request(url, "/score", json.dumps({"profile": "bike", "bbox": BBOX}))
+  assert status == 200
+  assert out["type"] == "FeatureCollection" and len(out["features"]) > 0
+  assert "index_bike:forward" in out["features"][0]["properties"]
+  status, out = _request(url, "/metrics")
+  assert status == 200 and out["counts"]["requests"] == 1
+
+@pytest.mark.parametrize("body", ["[]", "1", "not json", '{"profile": "bike"}',
+                                  '{"profile": "car", "bbox": [0, 0, 1, 1]}'])
+def test_handler_rejects_bad_requests(url, body):
+  status, out = _request(url, "/score", body)
+  assert status == 400 and "error" in out
+
+def test_handler_unknown_path(url):
+  assert _request(url, "/unknown")[0] == 404
+  assert _request(url, "/health") == (200, {"status": "ok"})
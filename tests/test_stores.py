@@ -0,0 +1,45 @@
+import threading
+
+from netapy.stores import AttributeStore
+
+def test_get_returns_requested_keys(tmp_path):
+  with AttributeStore(str(tmp_path / "store.db")) as store:
+    store.set("x", {
+      ("1", "a"): {"directed": False, "value": 1},
+      ("2", "a"): {"directed": True, "value": [1, 2]},
+      ("3", "b"): {"directed": False, "value": None}
+    })
+    out = store.get("x", [("1", "a"), ("2", "a"), ("2", "a"), ("3", "a")])
+    assert out == {
+      ("1", "a"): {"directed": False, "value": 1},
+      ("2", "a"): {"directed": True, "value": [1, 2]}
+    }
+    assert store.get("y", [("1", "a")]) == {}
+
+def test_clear(tmp_path):
+  with AttributeStore(str(tmp_path / "store.db")) as store:
+    store.set("x", {("1", "a"): {"directed": False, "value": 1}})
+    store.set("y", {("1", "a"): {"directed": False, "value": 2}})
+    store.clear("x")
+    assert store.get("x", [("1", "a")]) == {}
+    assert len(store.get("y", [("1", "a")])) == 1
+    store.clear()
+    assert store.get("y", [("1", "a")]) == {}
+
+def test_shared_across_threads(tmp_path):
+  store = AttributeStore(str(tmp_path / "store.db"))
+  errors = []
+  def work(i):
+    try:
+      store.set("x", {(str(i), "a"): {"directed": False, "value": i}})
+      assert store.get("x", [(str(i), "a")])[(str(i), "a")]["value"] == i
+    except Exception as e:
+      errors.append(e)
+  threads = [threading.Thread(target = work, args = (i, )) for i in range(8)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert not errors
+  assert len(store.get("x", [(str(i), "a") for i in range(8)])) == 8
+  store.close()
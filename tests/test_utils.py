@@ -0,0 +1,104 @@
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from netapy import utils
+
+HEAVY = ["geopandas", "networkx", "osmnx", "pandas", "pyproj", "shapely"]
+
+def _imported_after(statement):
+  code = f"import sys; {statement}; print(','.join(sorted(sys.modules)))"
+  out = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True)
+  return set(out.stdout.strip().split(","))
+
+def test_import_does_not_load_heavy_dependencies():
+  for statement in ["import netapy", "import netapy.assessors", "import netapy.cli"]:
+    # Lazily imported modules are registered, but their submodules are only
+    # imported once they are executed.
+    modules = _imported_after(statement)
+    assert not [x for x in modules if x.split(".")[0] in HEAVY and "." in x], statement
+
+def test_load_lazy_modules_from_threads():
+  code = (
+    "import threading; from netapy import utils; "
+    "pd = utils.lazy_import('pandas'); errors = []\n"
+    "def work():\n"
+    "  try:\n"
+    "    utils.load_lazy_modules(); pd.DataFrame({'a': [1]})\n"
+    "  except Exception as e:\n"
+    "    errors.append(e)\n"
+    "threads = [threading.Thread(target = work) for _ in range(8)]\n"
+    "[t.start() for t in threads]; [t.join() for t in threads]\n"
+    "assert not errors, errors"
+  )
+  subprocess.run([sys.executable, "-c", code], check = True)
+
+def test_lazy_import_returns_loaded_module():
+  assert utils.lazy_import("threading") is threading
+
+NAN = float("nan")
+
+@pytest.mark.parametrize("value, expected", [
+  ("50", 50),
+  ("50 km/h", 50),
+  ("50kmh", 50),
+  ("30 mph", 30 * 1.609344),
+  ("10 knots", 10 * 1.852),
+  ("30;50", 50),
+  ("30 mph;70", 70),
+  ("30-50", 40),
+  ("DE:urban", 50),
+  ("de:rural", 100),
+  ("AT:motorway", 130),
+  ("DE:zone30", 30),
+  ("AT:zone:20", 20),
+  ("walk", 7),
+  ("none", NAN),
+  ("signals", NAN),
+  ("DE:motorway", NAN),
+  ("FR:urban", NAN),
+  ("50 furlongs", NAN),
+  (True, NAN),
+  (30, 30),
+  (["30", "DE:zone20"], 30),
+  (None, NAN)
+])
+def test_parse_speed(value, expected):
+  out = utils.parse_speed([value])
+  assert np.isclose(out[0], expected, equal_nan = True)
+
+@pytest.mark.parametrize("value, expected", [
+  ("2.5", 2.5),
+  ("2,5", 2.5),
+  ("2.5 m", 2.5),
+  ("250 cm", 2.5),
+  ("10 ft", 3.048),
+  ("10'", 3.048),
+  ("6'6\"", 6 * 0.3048 + 6 * 0.0254),
+  ("5\"", 5 * 0.0254),
+  ("2;3", 3),
+  ("none", NAN),
+  ("'", NAN)
+])
+def test_parse_length(value, expected):
+  out = utils.parse_length([value])
+  assert np.isclose(out[0], expected, equal_nan = True)
+
+@pytest.mark.parametrize("value, expected", [
+  ("2", 2),
+  ("1;2", 2),
+  ("2 lanes", NAN),
+  ("none", NAN)
+])
+def test_parse_count(value, expected):
+  out = utils.parse_count([value])
+  assert np.isclose(out[0], expected, equal_nan = True)
+
+def test_parse_aggregation():
+  assert utils.parse_speed(["30;50"], how = "min")[0] == 30
+  assert utils.parse_speed(["30;50"], how = "mean")[0] == 40
+  with pytest.raises(ValueError):
+    utils.parse_speed(["30;50"], how = "median")